@@ -1,30 +1,95 @@
 import argparse
+import asyncio
 import sys, os, time
+import hashlib
+import json
+import signal
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+def probe(cmd):
+    """Return True if `cmd` runs and exits cleanly"""
+    try:
+        return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+    except Exception:
+        return False
+
+DEP_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "galilaio", "deps.json")
+
+def dep_cache_key(runner):
+    """Hash the PATH directories and their mtimes; installs/uninstalls change it"""
+    entries = [runner]
+    for p in os.environ.get("PATH", "").split(os.pathsep):
+        try:
+            entries.append(f"{p}:{os.stat(p).st_mtime_ns}")
+        except OSError:
+            continue
+    return hashlib.blake2b("|".join(entries).encode()).hexdigest()
+
+def read_dep_cache(key):
+    try:
+        with open(DEP_CACHE) as f:
+            cache = json.load(f)
+        return cache.get("key") == key and cache.get("ok") is True
+    except (OSError, ValueError):
+        return False
+
+def write_dep_cache(key, ok):
+    try:
+        os.makedirs(os.path.dirname(DEP_CACHE), exist_ok=True)
+        with open(DEP_CACHE, "w") as f:
+            json.dump({"key": key, "ok": ok}, f)
+    except OSError:
+        pass
 
 def check_deps(args):
     print("Checking dependencies...")
-    deps_present = True
-    if not args.npm:
-        try:
-            subprocess.run(['bun', '--version'], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except Exception as e:
+    runner = 'npm' if args.npm else 'bun'
+    key = dep_cache_key(runner)
+    if not args.no_dep_cache and read_dep_cache(key):
+        return True
+    cmds = [[runner, '--version'], ['uv', '--version']]
+
+    # Each probe is a fork/exec; overlap them rather than paying for each in turn
+    with ThreadPoolExecutor(max_workers=len(cmds)) as pool:
+        runner_ok, uv_ok = pool.map(probe, cmds)
+
+    if not runner_ok:
+        if not args.npm:
             print("Bun is not installed. Please install Bun from https://bun.sh/.")
             print("hint: you can pass --npm to use npm instead of bun, but bun is recommended. Deno who?")
-            deps_present = False
-    else:
-        try:
-            subprocess.run(['npm', '--version'], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except Exception as e:
+        else:
             print("npm is not installed. Please install npm from https://www.npmjs.com/get-npm.")
-            deps_present = False
-    try:
-        subprocess.run(['uv', '--version'], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except Exception as e:
+    if not uv_ok:
         print("uv is not installed. Please install uv from https://astral.sh. It is mandatory for running galilaio-visiond.")
-        deps_present = False
+    deps_present = runner_ok and uv_ok
+    write_dep_cache(key, deps_present)
     return deps_present
 
+CONFIG_PATH = os.path.join(".galilaio", "config.json")
+
+# Commands for each JS runner; the runner is chosen once at init and persisted
+RUNNERS = {
+    "bun": {"install": ['bun', 'i'], "dev": ['bunx', 'next', 'dev', '--turbo'], "verbose": ['-v']},
+    "npm": {"install": ['npm', 'i'], "dev": ['npm', 'run', 'dev'], "verbose": []},
+}
+
+def save_runner(runner):
+    os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
+    with open(CONFIG_PATH, "w") as f:
+        json.dump({"runner": runner}, f)
+
+def load_runner(args):
+    """--npm wins; otherwise use the runner recorded by --init, defaulting to bun"""
+    if args.npm:
+        return "npm"
+    try:
+        with open(CONFIG_PATH) as f:
+            runner = json.load(f).get("runner")
+    except (OSError, ValueError):
+        return "bun"
+    return runner if runner in RUNNERS else "bun"
+
 def gallilaio_init(args):
     print("Initializing Galilaio...")
     # Add initialization code here
@@ -32,30 +97,81 @@ def gallilaio_init(args):
         print("Please install the missing dependencies and try again.")
         exit(1)
     
-    os.chdir('core')
-    if not args.npm:
-        subprocess.run(['bun', 'i'], check=True)
-    else:
-        subprocess.run(['npm', 'i'], check=True)
-    
-    os.chdir('../vision')
-    subprocess.run(['uv', 'sync'], check=True)
+    runner = 'npm' if args.npm else 'bun'
+    subprocess.run(RUNNERS[runner]["install"], check=True, cwd="core")
+    subprocess.run(['uv', 'sync'], check=True, cwd="vision")
+    save_runner(runner)
     
     print("Initialization complete. Please configure your .env file in the core directory")
 
 def gallilaio_run(args):
     print("Running Galilaio...")
-    if not args.npm:
-        proc_js = subprocess.Popen(['bunx','next', 'dev', '--turbo', '-v' if args.verbose else ''], cwd="core")
-    else:
-        proc_js = subprocess.Popen(['npm', 'run', 'dev'], cwd="./core")
-    proc_vision = subprocess.Popen(['uv', 'run', 'fastapi', 'dev'], cwd="./vision")
+    asyncio.run(supervise(args))
+
+# Per-pipe buffer limit for child output; asyncio's 64 KiB default is easy to
+# pass with a long stack trace or JSON dump
+PIPE_LIMIT = 1024 * 1024
 
+async def supervise(args):
+    """Run both dev servers, multiplexing their output, until either exits"""
+    commands = RUNNERS[load_runner(args)]
+    proc_js = await asyncio.create_subprocess_exec(
+        *commands["dev"], *(commands["verbose"] if args.verbose else []),
+        cwd="core", stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, limit=PIPE_LIMIT)
+    proc_vision = await asyncio.create_subprocess_exec(
+        'uv', 'run', 'fastapi', 'dev',
+        cwd="vision", stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, limit=PIPE_LIMIT)
+    procs = [proc_js, proc_vision]
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            # Children exiting wakes the wait below; shutdown finishes there
+            loop.add_signal_handler(sig, terminate_children, procs)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C reaches the children directly
+
+    # Drain both pipes continuously so a chatty child never blocks on a full pipe
+    pumps = [
+        asyncio.create_task(pump(proc_js.stdout, "[js]")),
+        asyncio.create_task(pump(proc_vision.stdout, "[vision]")),
+    ]
+    await asyncio.wait([asyncio.create_task(proc.wait()) for proc in procs], return_when=asyncio.FIRST_COMPLETED)
+    await stop_children(procs)
+    await asyncio.gather(*pumps)
+
+async def pump(stream, prefix):
+    """Copy a child's output line by line; lines over PIPE_LIMIT go through in chunks"""
+    at_line_start = True
     while True:
-        True
-    
-    proc_vision.kill()
-    proc_js.kill()
+        try:
+            data = await stream.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            # EOF; flush whatever came without a trailing newline
+            data = e.partial
+            if not data:
+                return
+        except asyncio.LimitOverrunError as e:
+            data = await stream.read(e.consumed)
+        text = data.decode(errors='replace')
+        sys.stdout.write(f"{prefix} {text}" if at_line_start else text)
+        sys.stdout.flush()
+        at_line_start = text.endswith("\n")
+
+def terminate_children(procs):
+    for proc in procs:
+        if proc.returncode is None:
+            proc.terminate()
+
+async def stop_children(procs, timeout=5):
+    """Terminate child processes, killing any that ignore the request"""
+    terminate_children(procs)
+    for proc in procs:
+        try:
+            await asyncio.wait_for(proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser("Galilaio utility script")
@@ -63,6 +179,7 @@ if __name__ == "__main__":
     parser.add_argument("--run", help="Run Galilaio", type=bool, required=False)
     parser.add_argument("--verbose", help="Run Galilaio with verbosity", type=bool, required=False)
     parser.add_argument("--npm", help="Use npm instead of bun - not recommended ૮꒰ ˶• ༝ •˶꒱ა ♡", type=bool, required=False)
+    parser.add_argument("--no-dep-cache", help="Always re-probe dependencies instead of trusting the cached result", action="store_true")
     args = parser.parse_args()
 
     if args.init:
@@ -1,5 +1,19 @@
 import json
-from working_json_animator import create_working_animation_from_json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from util.render_worker import init_media_dir
+from working_json_animator import create_cached_animation_from_json
+
+logger = logging.getLogger(__name__)
+
+
+def _run_one(t):
+    # pyrefly: ignore  # bad-argument-type
+    success, anim_id, file_path = create_cached_animation_from_json(t['json'])
+    return t['name'], success, anim_id, file_path
 
 
 def run_tests():
@@ -156,26 +170,30 @@ def run_tests():
     ]
 
     results = []
-    print('Running JSON-driven animation tests...')
-    for t in tests:
-        name = t['name']
-        print(f"\n▶ {name}")
-        # pyrefly: ignore  # bad-argument-type
-        success, anim_id, file_path = create_working_animation_from_json(t['json'])
-        print('  success:', success)
-        print('  id     :', anim_id)
-        print('  file   :', file_path)
-        results.append((name, success, file_path))
+    out = []
+    logger.info('Running JSON-driven animation tests...')
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=init_media_dir) as pool:
+        futures = [pool.submit(_run_one, t) for t in tests]
+        for done, future in enumerate(as_completed(futures), 1):
+            name, success, anim_id, file_path = future.result()
+            logger.info('[%d/%d] %s', done, len(tests), name)
+            out.append(f"▶ {name}  ok={success} id={anim_id} file={file_path}")
+            results.append((name, success, file_path))
 
-    print('\nSummary:')
+    out.append('\nSummary:')
     passed = 0
     for name, success, file_path in results:
         status = '✅' if success else '❌'
         if success:
             passed += 1
-        print(f"  {status} {name}: {file_path}")
-    print(f"\nPassed {passed}/{len(results)}")
+        out.append(f"  {status} {name}: {file_path}")
+    out.append(f"\nPassed {passed}/{len(results)}")
+
+    # One write for the whole report instead of several per test
+    sys.stdout.write("\n".join(out) + "\n")
+    sys.stdout.flush()
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     run_tests()
@@ -1,5 +1,3 @@
-from starlette.responses import StreamingResponse
-from fastapi.openapi.models import Response
 """
 Manim Animation Tool - Main FastAPI Application
 Generates mathematical animations from natural language descriptions
@@ -8,16 +6,20 @@ Generates mathematical animations from natural language descriptions
 import os
 import time
 import asyncio
+import functools
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Optional
 import base64
 import io
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+import anyio
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, Response
 from PIL import Image
 import uvicorn
-import glob
+import orjson
 
 from util.lib.request import (
     AnimationRequest,
@@ -27,29 +29,147 @@ from util.lib.request import (
     JSONAnimationRequest,
 )
 from util.function_parser import FunctionParser
-from util.manim_engine import ManimAnimationEngine
-from working_json_animator import create_working_animation_from_json
+from util.render_worker import RENDER_WORKERS, create_render_pool, noop, render_function_batch
+from util.middleware import JSONGZipMiddleware
+from util.animation_files import count_animations, scan_and_unlink
+from working_json_animator import CACHE_DIR, create_cached_animation_from_json
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Manim Animation Tool",
     description="Generate mathematical animations from natural language descriptions using Manim",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
+app.add_middleware(JSONGZipMiddleware, minimum_size=500)
 
 
 
 # Initialize components
 function_parser = FunctionParser()
-animation_engine = ManimAnimationEngine()
 
 # Output directory for animations
 OUTPUT_DIR = Path("animations")
 OUTPUT_DIR.mkdir(exist_ok=True)
 
-@app.get("/")
-def read_root():
-    """Root endpoint with API information"""
+# Manim renders are CPU-bound and synchronous; run them in worker processes so the
+# event loop keeps serving requests, and cap in-flight renders at the pool size.
+# The pool is created at startup, so importing this module never spawns one
+RENDER_POOL: Optional[ProcessPoolExecutor] = None
+
+# Backpressure: at most MAX_CONC renders run, at most MAX_QUEUE wait behind them,
+# and a waiter gives up after QUEUE_TIMEOUT seconds; anything else gets a 503
+RENDER_MAX_CONC = int(os.getenv("GALILAIO_MAX_CONC", RENDER_WORKERS))
+RENDER_MAX_QUEUE = int(os.getenv("GALILAIO_MAX_QUEUE", RENDER_MAX_CONC * 4))
+RENDER_QUEUE_TIMEOUT = float(os.getenv("GALILAIO_QUEUE_TIMEOUT", 30))
+RENDER_SLOTS = asyncio.Semaphore(RENDER_MAX_CONC)
+render_stats = {"active": 0, "waiting": 0}
+
+def _busy(detail: str) -> HTTPException:
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": "10"})
+
+async def _run_render(fn, *args):
+    """Run a render function in the process pool, waiting for a free slot"""
+    if render_stats["waiting"] >= RENDER_MAX_QUEUE:
+        raise _busy("Render queue is full")
+    render_stats["waiting"] += 1
+    try:
+        await asyncio.wait_for(RENDER_SLOTS.acquire(), timeout=RENDER_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise _busy("Timed out waiting for a render slot")
+    finally:
+        render_stats["waiting"] -= 1
+
+    render_stats["active"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(RENDER_POOL, fn, *args)
+    finally:
+        render_stats["active"] -= 1
+        RENDER_SLOTS.release()
+
+# Micro-batching for /generate-animation: requests arriving within BATCH_WAIT seconds
+# (up to BATCH_MAX) are grouped, identical ones share a single render, and the rest
+# are split across the pool so each worker gets one task instead of one per request
+BATCH_MAX = int(os.getenv("GALILAIO_BATCH_MAX", 8))
+BATCH_WAIT = float(os.getenv("GALILAIO_BATCH_WAIT", 0.1))
+_batch_queue: asyncio.Queue = asyncio.Queue()
+_batch_tasks: set = set()
+
+async def _submit_function_animation(params: dict):
+    """Queue a render for the batcher and wait for its result"""
+    future = asyncio.get_running_loop().create_future()
+    await _batch_queue.put((params, future))
+    return await future
+
+async def _collect_batch():
+    """Wait for one request, then take whatever else arrives within BATCH_WAIT"""
+    batch = [await _batch_queue.get()]
+    deadline = asyncio.get_running_loop().time() + BATCH_WAIT
+    while len(batch) < BATCH_MAX:
+        timeout = deadline - asyncio.get_running_loop().time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(_batch_queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+async def _render_chunk(chunk: list, waiters: dict):
+    """Render one chunk of unique jobs and resolve every request waiting on them"""
+    try:
+        results = await _run_render(render_function_batch, [params for _, params in chunk])
+    except Exception as e:
+        for key, _ in chunk:
+            for future in waiters[key]:
+                if not future.done():
+                    future.set_exception(e)
+        return
+    for (key, _), result in zip(chunk, results):
+        for future in waiters[key]:
+            if not future.done():
+                future.set_result(result)
+
+async def _batcher():
+    while True:
+        batch = await _collect_batch()
+        waiters: dict[bytes, list] = {}
+        unique = []
+        for params, future in batch:
+            key = orjson.dumps(params, option=orjson.OPT_SORT_KEYS)
+            if key not in waiters:
+                waiters[key] = []
+                unique.append((key, params))
+            waiters[key].append(future)
+        n_chunks = min(len(unique), RENDER_WORKERS)
+        chunks = [unique[i::n_chunks] for i in range(n_chunks)]
+        # Don't block the next batch on this one finishing
+        for chunk in chunks:
+            task = asyncio.create_task(_render_chunk(chunk, waiters))
+            _batch_tasks.add(task)
+            task.add_done_callback(_batch_tasks.discard)
+
+# animation_id -> rendered file, filled in as renders finish and emptied by the
+# cleanup passes as they delete the files
+ANIM_INDEX: dict[str, Path] = {}
+
+@app.on_event("startup")
+async def _start_render_pool():
+    global RENDER_POOL
+    RENDER_POOL = create_render_pool()
+    # Bring every worker up now so the first requests don't pay for imports
+    for _ in range(RENDER_WORKERS):
+        RENDER_POOL.submit(noop)
+    app.state.batcher = asyncio.create_task(_batcher())
+
+@app.on_event("shutdown")
+def _shutdown_render_pool():
+    app.state.batcher.cancel()
+    RENDER_POOL.shutdown(cancel_futures=True)
+
+def _root_info():
+    """API information served at /"""
     return {
         "service": "Manim Animation Tool",
         "version": "1.0.0",
@@ -60,7 +180,8 @@ def read_root():
             "POST /generate-animation-json": "Generate animation from LLM-style JSON",
             "GET /download/{animation_id}": "Download generated animation",
             "GET /examples": "Get function examples",
-            "GET /health": "Health check"
+            "GET /health": "Health check",
+            "GET /cache-stats": "Function parser cache statistics"
         },
         "example_request": {
             "type": "riemann_sum",
@@ -69,12 +190,42 @@ def read_root():
             "options": {"sum_type": "right", "num_rectangles": 12}
         }
     }
+
+def _examples_info():
+    """Supported function descriptions served at /examples"""
+    examples = function_parser.get_function_examples()
+    
+    return {
+        "message": "Supported function descriptions",
+        "examples": examples,
+        "usage_tips": [
+            "Use plain English to describe mathematical functions",
+            "Examples: 'x squared plus two x minus one', 'sine of x', 'exponential of x'",
+            "Supported operations: plus, minus, times, divided by, squared, cubed, to the power of",
+            "Supported functions: sine, cosine, tangent, exponential, natural log, square root"
+        ]
+    }
+
+# Both payloads are static; encode them once instead of on every request
+_ROOT_BYTES = orjson.dumps(_root_info())
+_EXAMPLES_BYTES = orjson.dumps(_examples_info())
+
+def _etag(payload: bytes) -> str:
+    return '"' + hashlib.md5(payload).hexdigest() + '"'
+
+_EXAMPLES_ETAG = _etag(_EXAMPLES_BYTES)
+
+@app.get("/")
+def read_root():
+    """Root endpoint with API information"""
+    return Response(content=_ROOT_BYTES, media_type="application/json")
+
 @app.post("/generate-animation-json", response_model=AnimationResponse)
 async def generate_animation_json(request: JSONAnimationRequest):
     """Generate an animation from LLM-style JSON (matches working JSON animator)."""
     try:
-        req_dict = request.dict(by_alias=True)
-        success, animation_id, file_path = create_working_animation_from_json(req_dict)
+        req_dict = request.model_dump(mode="json", by_alias=True)
+        success, animation_id, file_path = await _run_render(create_cached_animation_from_json, req_dict)
         if not success:
             return AnimationResponse(
                 animation_id=animation_id,
@@ -82,12 +233,17 @@ async def generate_animation_json(request: JSONAnimationRequest):
                 message="Failed to generate animation from JSON",
                 error=file_path,
             )
-        return AnimationResponse(
+        ANIM_INDEX[animation_id] = Path(file_path)
+        # Trusted hop: every value comes from the renderer, not the client, so skip
+        # validation here; inbound request models are still fully validated
+        return AnimationResponse.model_construct(
             animation_id=animation_id,
             status="completed",
             message="Animation generated successfully",
             file_path=file_path,
         )
+    except HTTPException:
+        raise
     except Exception as e:
         return AnimationResponse(
             animation_id="",
@@ -101,7 +257,7 @@ async def generate_animation(request: AnimationRequest, background_tasks: Backgr
     """Generate a mathematical animation from natural language description"""
     try:
         # Parse and validate the function
-        success, parsed_func, func_type, latex_expr = function_parser.parse_function(request.function_description)
+        success, parsed_func, func_type, latex_expr = await anyio.to_thread.run_sync(function_parser.parse_function, request.function_description)
         if not success:
             return AnimationResponse(
                 animation_id="",
@@ -111,7 +267,7 @@ async def generate_animation(request: AnimationRequest, background_tasks: Backgr
             )
         
         # Generate animation
-        success, animation_id, error = animation_engine.create_animation(
+        success, animation_id, error, preview_image = await _submit_function_animation(dict(
             function_description=request.function_description,
             domain=request.domain,
             range_vals=request.range_vals,
@@ -120,7 +276,7 @@ async def generate_animation(request: AnimationRequest, background_tasks: Backgr
             show_grid=request.show_grid,
             show_axes=request.show_axes,
             show_labels=request.show_labels
-        )
+        ))
         
         if not success:
             return AnimationResponse(
@@ -130,13 +286,15 @@ async def generate_animation(request: AnimationRequest, background_tasks: Backgr
                 error=error
             )
         
-        # Create preview image (placeholder for now)
-        preview_image = _create_preview_image(parsed_func, request.domain)
+        if animation_id not in ANIM_INDEX:
+            app.state.animation_count += 1
+        ANIM_INDEX[animation_id] = OUTPUT_DIR / f"{animation_id}.mp4"
         
         # Schedule cleanup
         background_tasks.add_task(_cleanup_old_files)
         
-        return AnimationResponse(
+        # Trusted hop: built from engine output, so skip validation
+        return AnimationResponse.model_construct(
             animation_id=animation_id,
             status="completed",
             message="Animation generated successfully",
@@ -144,6 +302,8 @@ async def generate_animation(request: AnimationRequest, background_tasks: Backgr
             preview_image=preview_image
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         return AnimationResponse(
             animation_id="",
@@ -156,7 +316,7 @@ async def generate_animation(request: AnimationRequest, background_tasks: Backgr
 async def parse_function(request: FunctionParseRequest):
     """Test function parsing without generating animation"""
     try:
-        success, parsed_func, func_type, latex_expr = function_parser.parse_function(request.function_description)
+        success, parsed_func, func_type, latex_expr = await anyio.to_thread.run_sync(function_parser.parse_function, request.function_description)
         
         if success:
             return FunctionParseResponse(
@@ -189,32 +349,46 @@ async def parse_function(request: FunctionParseRequest):
 @app.get("/download/{animation_id}")
 async def download_animation(animation_id: str):
     """Download the generated animation MP4 file"""
-    file_path = OUTPUT_DIR / f"{animation_id}.mp4"
+    file_path = ANIM_INDEX.get(animation_id)
+    if file_path is None:
+        # Not rendered by this process; cached JSON renders are named by id
+        file_path = OUTPUT_DIR / f"{animation_id}.mp4"
+        if not file_path.exists():
+            file_path = CACHE_DIR / f"{animation_id}.mp4"
     
-    if not file_path.exists():
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Animation not found")
     
+    # FileResponse sets Content-Length/Accept-Ranges from the stat and hands the
+    # path to the server via the ASGI pathsend extension when it supports it,
+    # so the body goes file -> socket without passing through Python
     return FileResponse(
         path=file_path,
         filename=f"animation_{animation_id}.mp4",
-        media_type="video/mp4"
+        media_type="video/mp4",
+        stat_result=stat_result,
+        # Ids never get re-rendered, so repeat views can come from the browser cache
+        headers={"Cache-Control": "public, max-age=300"},
     )
 
 @app.get("/examples")
-async def get_function_examples():
+async def get_function_examples(request: Request):
     """Get examples of supported function descriptions"""
-    examples = function_parser.get_function_examples()
-    
-    return {
-        "message": "Supported function descriptions",
-        "examples": examples,
-        "usage_tips": [
-            "Use plain English to describe mathematical functions",
-            "Examples: 'x squared plus two x minus one', 'sine of x', 'exponential of x'",
-            "Supported operations: plus, minus, times, divided by, squared, cubed, to the power of",
-            "Supported functions: sine, cosine, tangent, exponential, natural log, square root"
-        ]
-    }
+    headers = {"ETag": _EXAMPLES_ETAG, "Cache-Control": "public, max-age=3600"}
+    if request.headers.get("if-none-match") == _EXAMPLES_ETAG:
+        return Response(status_code=304, headers=headers)
+    return Response(content=_EXAMPLES_BYTES, media_type="application/json", headers=headers)
+
+@app.post("/admin/reload")
+async def reload_static_responses():
+    """Rebuild the pre-encoded / and /examples payloads"""
+    global _ROOT_BYTES, _EXAMPLES_BYTES, _EXAMPLES_ETAG
+    _ROOT_BYTES = orjson.dumps(_root_info())
+    _EXAMPLES_BYTES = orjson.dumps(_examples_info())
+    _EXAMPLES_ETAG = _etag(_EXAMPLES_BYTES)
+    return {"status": "reloaded"}
 
 @app.get("/health")
 async def health_check():
@@ -224,11 +398,53 @@ async def health_check():
         "service": "manim-animation-tool",
         "timestamp": time.time(),
         "output_directory": str(OUTPUT_DIR),
-        "total_animations": len(list(OUTPUT_DIR.glob("*.mp4")))
+        "total_animations": app.state.animation_count,
+        "render_queue": {
+            "active": render_stats["active"],
+            "waiting": render_stats["waiting"],
+            "max_concurrency": RENDER_MAX_CONC,
+            "max_queue": RENDER_MAX_QUEUE,
+        }
     }
 
-def sort_factor(file):
-    return os.stat(file).st_mtime
+@app.get("/cache-stats")
+async def cache_stats():
+    """Function parser cache statistics"""
+    info = function_parser.cache_info()
+    return {
+        "parse_function": {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+        }
+    }
+
+# /health reports this instead of scanning OUTPUT_DIR; it's bumped when a render
+# lands and resynced from the directory by every cleanup pass
+app.state.animation_count = count_animations(OUTPUT_DIR)
+
+LATEST_DIR = "./media/videos/720p30"
+
+@functools.lru_cache(maxsize=1)
+def _latest_in(dir_mtime_ns: int, tick: int):
+    """Newest render in LATEST_DIR; arguments only key the cache"""
+    with os.scandir(LATEST_DIR) as it:
+        latest = max(
+            (entry for entry in it if entry.name.endswith(".mp4") and entry.is_file()),
+            key=lambda entry: entry.stat().st_mtime,
+            default=None,
+        )
+    return latest.path if latest else None
+
+def _find_latest_video():
+    """Path of the most recently modified render, or None"""
+    try:
+        dir_mtime_ns = os.stat(LATEST_DIR).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    # Frontends poll /latest; reuse the scan until the directory changes or a second passes
+    return _latest_in(dir_mtime_ns, int(time.time()))
 
 
 @app.options("/latest")
@@ -244,39 +460,27 @@ async def handle_options():
 @app.get("/latest")
 async def fetch_latest_video():
     try:
-        mypath = "./media/videos/720p30/*.mp4"
-        onlyfiles = glob.glob(mypath)
+        latest_file = await anyio.to_thread.run_sync(_find_latest_video)
         
-        if not onlyfiles:
+        if latest_file is None:
             return JSONResponse({"error": "No video files found"}, status_code=404)
-            
-        # Sort by modification time, newest first
-        onlyfiles.sort(key=sort_factor)
-        latest_file = onlyfiles[len(onlyfiles) - 1]
         
-        # Verify the file exists and is readable
-        if not os.path.isfile(latest_file):
+        # Verify the file still exists; the stat is reused by FileResponse
+        try:
+            stat_result = os.stat(latest_file)
+        except FileNotFoundError:
             return JSONResponse({"error": "Video file not found"}, status_code=404)
-            
-        # Get file stats for headers
-        file_size = os.path.getsize(latest_file)
-        last_modified = os.path.getmtime(latest_file)
         
-        # Create a file-like object to stream the file
-        file_like = open(latest_file, mode="rb")
-        
-        # Create a streaming response with appropriate headers
-        response = StreamingResponse(
-            file_like,
+        # FileResponse sets Content-Length, Last-Modified and ETag, answers Range
+        # requests so players can seek, and releases the file when the client goes away
+        response = FileResponse(
+            path=latest_file,
             media_type="video/mp4",
+            stat_result=stat_result,
             headers={
-                "Accept-Ranges": "bytes",
-                "Content-Length": str(file_size),
-                "Content-Type": "video/mp4",
                 "Cache-Control": "no-cache, no-store, must-revalidate",
                 "Pragma": "no-cache",
                 "Expires": "0",
-                "Last-Modified": time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(last_modified))
             }
         )
         
@@ -284,7 +488,7 @@ async def fetch_latest_video():
         response.headers["Access-Control-Allow-Origin"] = "*"
         response.headers["Access-Control-Allow-Methods"] = "GET, OPTIONS"
         response.headers["Access-Control-Allow-Headers"] = "Content-Type"
-        response.headers["Access-Control-Expose-Headers"] = "Content-Length, Last-Modified"
+        response.headers["Access-Control-Expose-Headers"] = "Content-Length, Content-Range, Accept-Ranges, Last-Modified"
         
         return response
         
@@ -297,27 +501,59 @@ async def fetch_latest_video():
         response.headers["Access-Control-Allow-Origin"] = "*"
         return response
 
+# Every generate request schedules a cleanup; run at most one per interval
+CLEANUP_INTERVAL = 60
+_cleanup_lock = asyncio.Lock()
+_last_cleanup = 0.0
+
 async def _cleanup_old_files():
     """Clean up animation files older than 1 hour"""
-    current_time = time.time()
-    for file_path in OUTPUT_DIR.glob("*.mp4"):
-        if current_time - file_path.stat().st_mtime > 3600:  # 1 hour
-            file_path.unlink()
+    global _last_cleanup
+    if _cleanup_lock.locked() or time.monotonic() - _last_cleanup < CLEANUP_INTERVAL:
+        return
+    async with _cleanup_lock:
+        _last_cleanup = time.monotonic()
+        app.state.animation_count = await asyncio.to_thread(scan_and_unlink, OUTPUT_DIR, index=ANIM_INDEX)
+        await asyncio.to_thread(_prune_cache)
 
-def _create_preview_image(parsed_function: str, domain: list) -> str:
-    """Create a preview image (placeholder implementation)"""
-    try:
-        # This would create an actual preview image
-        # For now, return a placeholder
-        return "preview_placeholder_base64"
-    except:
-        return ""
+# Request-hash cache: entries unused for CACHE_MAX_AGE go, and beyond
+# CACHE_MAX_FILES the least recently used are dropped
+CACHE_MAX_AGE = 24 * 3600
+CACHE_MAX_FILES = 500
+
+def _prune_cache():
+    """Evict stale cache entries; a hit refreshes an entry's mtime"""
+    if not CACHE_DIR.is_dir():
+        return
+    cutoff = time.time() - CACHE_MAX_AGE
+    kept = []
+    with os.scandir(CACHE_DIR) as it:
+        for entry in it:
+            if not entry.name.endswith(".mp4") or not entry.is_file(follow_symlinks=False):
+                continue
+            mtime = entry.stat(follow_symlinks=False).st_mtime
+            if mtime < cutoff:
+                os.unlink(entry.path)
+                ANIM_INDEX.pop(entry.name[:-4], None)
+            else:
+                kept.append((mtime, entry.name, entry.path))
+    if len(kept) > CACHE_MAX_FILES:
+        kept.sort()
+        for _, name, path in kept[:len(kept) - CACHE_MAX_FILES]:
+            os.unlink(path)
+            ANIM_INDEX.pop(name[:-4], None)
 
 if __name__ == "__main__":
-    # Run the server
+    # Renders already fan out over RENDER_POOL, and every HTTP worker would start
+    # its own pool, so default to one; GALILAIO_DEV=1 restores auto-reload
+    dev = os.getenv("GALILAIO_DEV") == "1"
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8002,  # Different port from other services
-        reload=True
+        # "auto" takes uvloop/httptools when installed (uvloop has no Windows build)
+        loop="auto",
+        http="auto",
+        reload=dev,
+        workers=None if dev else int(os.getenv("GALILAIO_HTTP_WORKERS", 1))
     )
@@ -11,15 +11,19 @@ from typing import Optional
 import base64
 import io
 import uuid
+import functools
+import hashlib
+import subprocess
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, Response
 from PIL import Image
 import uvicorn
+import orjson
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-from matplotlib import rc
+from matplotlib import rc, rcParams
 import sympy as sp
 
 # Configure matplotlib
@@ -27,14 +31,18 @@ plt.style.use('dark_background')
 rc('font', size=12)
 
 from util.lib.request import AnimationRequest, AnimationResponse, FunctionParseRequest, FunctionParseResponse
-from util.function_parser import FunctionParser
+from util.function_parser import FunctionParser, polynomial_evaluator
+from util.middleware import JSONGZipMiddleware
+from util.animation_files import count_animations, scan_and_unlink
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Manim Animation Tool",
     description="Generate mathematical animations from standard mathematical expressions",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
+app.add_middleware(JSONGZipMiddleware, minimum_size=500)
 
 # Initialize components
 function_parser = FunctionParser()
@@ -43,6 +51,75 @@ function_parser = FunctionParser()
 OUTPUT_DIR = Path("animations")
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+@functools.lru_cache(maxsize=256)
+def _lambdify(parsed_func: str):
+    """Compile a parsed function to a NumPy callable; lambdify generates and execs source, so reuse it"""
+    x = sp.Symbol('x')
+    expr = sp.sympify(parsed_func)
+    poly = polynomial_evaluator(expr, x)
+    if poly is not None:
+        return poly
+    return sp.lambdify(x, expr, modules=['numpy', 'math'], cse=True)
+
+def _sample(func, x_vals: np.ndarray) -> np.ndarray:
+    """Evaluate func over x_vals in one vectorized call; non-finite results become NaN"""
+    with np.errstate(all='ignore'):
+        try:
+            y_vals = np.asarray(func(x_vals), dtype=np.float64)
+        except (TypeError, ValueError):
+            # Expression doesn't broadcast (e.g. it resolved to math.*); go point by point
+            def point(x_val):
+                try:
+                    return float(func(x_val))
+                except Exception:
+                    return np.nan
+            y_vals = np.vectorize(point, otypes=[np.float64])(x_vals)
+    # Constant expressions lambdify to a scalar
+    y_vals = np.broadcast_to(y_vals, x_vals.shape).copy()
+    y_vals[~np.isfinite(y_vals)] = np.nan
+    return y_vals
+
+def _encoder_works(ffmpeg: str, codec: str) -> bool:
+    """
+    Whether codec can actually encode here. `-encoders` lists what was compiled
+    in, not what the hardware runs, so try a one-frame encode.
+    """
+    try:
+        subprocess.run(
+            [ffmpeg, '-hide_banner', '-loglevel', 'error',
+             '-f', 'lavfi', '-i', 'color=s=256x256:d=0.04',
+             '-c:v', codec, '-f', 'null', '-'],
+            capture_output=True, check=True, timeout=15
+        )
+    except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return False
+    return True
+
+@functools.lru_cache(maxsize=1)
+def _pick_encoder():
+    """Fastest H.264 encoder this ffmpeg build offers and the machine can run, with the args it needs"""
+    ffmpeg = rcParams['animation.ffmpeg_path']
+    try:
+        encoders = subprocess.run(
+            [ffmpeg, '-hide_banner', '-encoders'],
+            capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        encoders = ""
+    if 'h264_nvenc' in encoders and _encoder_works(ffmpeg, 'h264_nvenc'):
+        return 'h264_nvenc', ['-preset', 'p1']
+    if 'h264_videotoolbox' in encoders and _encoder_works(ffmpeg, 'h264_videotoolbox'):
+        return 'h264_videotoolbox', []
+    return 'libx264', ['-preset', 'ultrafast']
+
+def _mp4_writer(fps: int = 30):
+    codec, args = _pick_encoder()
+    return animation.FFMpegWriter(
+        fps=fps,
+        codec=codec,
+        extra_args=args + ['-pix_fmt', 'yuv420p', '-movflags', '+faststart']
+    )
+
 class SimpleAnimator:
     """Simple animation generator using matplotlib"""
     
@@ -84,37 +161,30 @@ class SimpleAnimator:
             
             # Create function
             x_vals = np.linspace(domain[0], domain[1], 1000)
-            x = sp.Symbol('x')
-            expr = sp.sympify(parsed_func)
-            func = sp.lambdify(x, expr, modules=['numpy', 'math'])
+            func = _lambdify(parsed_func)
             
             # Initialize line
             line, = ax.plot([], [], 'yellow', linewidth=3)
             
-            # Animation function
-            def animate(frame):
-                progress = min(frame / (duration * 30), 1.0)  # 30 fps
-                end_idx = int(len(x_vals) * progress)
-                
+            # Evaluate the whole curve once; frames only reveal more of it
+            y_all = _sample(func, x_vals)
+            
+            # Animation function; each frame is the number of points revealed so far
+            def animate(end_idx):
                 if end_idx > 0:
-                    x_show = x_vals[:end_idx]
-                    try:
-                        y_show = [func(x) for x in x_show if not (np.isnan(func(x)) or np.isinf(func(x)))]
-                        if len(y_show) == len(x_show):
-                            line.set_data(x_show, y_show)
-                    except:
-                        pass
+                    line.set_data(x_vals[:end_idx], y_all[:end_idx])
                 return line,
             
             # Create animation
-            frames = int(duration * 30)
+            frames = int(duration * 30)  # 30 fps
+            reveal = np.linspace(0, len(x_vals), frames, endpoint=False, dtype=int)
             anim = animation.FuncAnimation(
-                fig, animate, frames=frames, interval=33, blit=True, repeat=True
+                fig, animate, frames=reveal, interval=33, blit=True, repeat=True
             )
             
-            # Save as GIF
-            output_file = OUTPUT_DIR / f"{animation_id}.gif"
-            anim.save(output_file, writer='pillow', fps=30, dpi=100)
+            # Save as H.264 MP4 (hardware encoder when available)
+            output_file = OUTPUT_DIR / f"{animation_id}.mp4"
+            anim.save(output_file, writer=_mp4_writer(30), dpi=100)
             plt.close(fig)
             
             return True, animation_id, None
@@ -130,21 +200,13 @@ class SimpleAnimator:
         
         try:
             x_vals = np.linspace(domain[0], domain[1], 1000)
-            x = sp.Symbol('x')
-            expr = sp.sympify(parsed_func)
-            func = sp.lambdify(x, expr, modules=['numpy', 'math'])
+            func = _lambdify(parsed_func)
             
-            y_vals = []
-            for x_val in x_vals:
-                try:
-                    y_val = func(x_val)
-                    if not (np.isnan(y_val) or np.isinf(y_val)):
-                        y_vals.append(y_val)
-                except:
-                    continue
+            y_vals = _sample(func, x_vals)
+            y_vals = y_vals[~np.isnan(y_vals)]
             
-            if y_vals:
-                y_min, y_max = min(y_vals), max(y_vals)
+            if y_vals.size:
+                y_min, y_max = float(y_vals.min()), float(y_vals.max())
                 y_range = y_max - y_min
                 return y_min - 0.1 * y_range, y_max + 0.1 * y_range
             else:
@@ -178,6 +240,11 @@ def read_root():
 async def generate_animation(request: AnimationRequest, background_tasks: BackgroundTasks):
     """Generate a mathematical animation from standard mathematical expression"""
     try:
+        # The first render probes ffmpeg's encoders (blocking subprocesses with
+        # timeouts); do that off the event loop, later renders hit the cache
+        if _pick_encoder.cache_info().currsize == 0:
+            await asyncio.to_thread(_pick_encoder)
+        
         # Generate animation
         success, animation_id, error = SimpleAnimator.create_animation(
             function_description=request.function_description,
@@ -195,14 +262,17 @@ async def generate_animation(request: AnimationRequest, background_tasks: Backgr
                 error=error
             )
         
+        app.state.animation_count += 1
+        
         # Schedule cleanup
         background_tasks.add_task(_cleanup_old_files)
         
-        return AnimationResponse(
+        # Trusted hop: built from engine output, so skip validation
+        return AnimationResponse.model_construct(
             animation_id=animation_id,
             status="completed",
             message="Animation generated successfully",
-            file_path=f"animations/{animation_id}.gif"
+            file_path=f"animations/{animation_id}.mp4"
         )
         
     except Exception as e:
@@ -250,32 +320,37 @@ async def parse_function(request: FunctionParseRequest):
 @app.get("/download/{animation_id}")
 async def download_animation(animation_id: str):
     """Download the generated animation file"""
-    file_path = OUTPUT_DIR / f"{animation_id}.gif"
+    file_path = OUTPUT_DIR / f"{animation_id}.mp4"
     
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Animation not found")
     
     return FileResponse(
         path=file_path,
-        filename=f"animation_{animation_id}.gif",
-        media_type="image/gif"
+        filename=f"animation_{animation_id}.mp4",
+        media_type="video/mp4"
     )
 
+# Static payload; encode it once and let clients revalidate with the ETag
+_EXAMPLES_BYTES = orjson.dumps({
+    "message": "Supported function expressions",
+    "examples": function_parser.get_function_examples(),
+    "usage_tips": [
+        "Use standard mathematical notation",
+        "Examples: 'x^2 + 3x + 2', 'sin(x)', 'exp(x)'",
+        "Supported operations: +, -, *, /, ^ (exponentiation)",
+        "Supported functions: sin, cos, tan, exp, log, sqrt"
+    ]
+})
+_EXAMPLES_ETAG = '"' + hashlib.md5(_EXAMPLES_BYTES).hexdigest() + '"'
+
 @app.get("/examples")
-async def get_function_examples():
+async def get_function_examples(request: Request):
     """Get examples of supported function expressions"""
-    examples = function_parser.get_function_examples()
-    
-    return {
-        "message": "Supported function expressions",
-        "examples": examples,
-        "usage_tips": [
-            "Use standard mathematical notation",
-            "Examples: 'x^2 + 3x + 2', 'sin(x)', 'exp(x)'",
-            "Supported operations: +, -, *, /, ^ (exponentiation)",
-            "Supported functions: sin, cos, tan, exp, log, sqrt"
-        ]
-    }
+    headers = {"ETag": _EXAMPLES_ETAG, "Cache-Control": "public, max-age=3600"}
+    if request.headers.get("if-none-match") == _EXAMPLES_ETAG:
+        return Response(status_code=304, headers=headers)
+    return Response(content=_EXAMPLES_BYTES, media_type="application/json", headers=headers)
 
 @app.get("/health")
 async def health_check():
@@ -285,21 +360,39 @@ async def health_check():
         "service": "manim-animation-tool",
         "timestamp": time.time(),
         "output_directory": str(OUTPUT_DIR),
-        "total_animations": len(list(OUTPUT_DIR.glob("*.gif")))
+        "total_animations": app.state.animation_count
     }
 
+# /health reports this instead of scanning OUTPUT_DIR; it's bumped when a render
+# lands and resynced from the directory by every cleanup pass
+app.state.animation_count = count_animations(OUTPUT_DIR)
+
+# Every generate request schedules a cleanup; run at most one per interval
+CLEANUP_INTERVAL = 60
+_cleanup_lock = asyncio.Lock()
+_last_cleanup = 0.0
+
 async def _cleanup_old_files():
     """Clean up animation files older than 1 hour"""
-    current_time = time.time()
-    for file_path in OUTPUT_DIR.glob("*.gif"):
-        if current_time - file_path.stat().st_mtime > 3600:  # 1 hour
-            file_path.unlink()
+    global _last_cleanup
+    if _cleanup_lock.locked() or time.monotonic() - _last_cleanup < CLEANUP_INTERVAL:
+        return
+    async with _cleanup_lock:
+        _last_cleanup = time.monotonic()
+        app.state.animation_count = await asyncio.to_thread(scan_and_unlink, OUTPUT_DIR)
 
 if __name__ == "__main__":
     # Run the server
+    # Renders run inside the request handlers, so use a worker per core;
+    # GALILAIO_DEV=1 restores single-process auto-reload
+    dev = os.getenv("GALILAIO_DEV") == "1"
     uvicorn.run(
         "simple_main:app",
         host="0.0.0.0",
         port=8002,
-        reload=True
+        # "auto" takes uvloop/httptools when installed (uvloop has no Windows build)
+        loop="auto",
+        http="auto",
+        reload=dev,
+        workers=None if dev else int(os.getenv("GALILAIO_HTTP_WORKERS", os.cpu_count() or 1))
     )
@@ -19,4 +19,9 @@ echo "📖 API docs available at: http://localhost:8002/docs"
 echo "🔍 Health check at: http://localhost:8002/health"
 echo "🎯 Test the service with: python test_tool.py"
 
-uv run python main.py
+if [ "$1" = "--prod" ]; then
+    # One HTTP worker by default: renders already use a process pool per worker
+    uv run gunicorn main:app -k uvicorn.workers.UvicornWorker -w "${GALILAIO_HTTP_WORKERS:-1}" --bind 0.0.0.0:8002
+else
+    uv run python main.py
+fi
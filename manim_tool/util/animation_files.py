@@ -0,0 +1,34 @@
+"""
+Rendered animation files
+Directory bookkeeping shared by the main and simple servers
+"""
+
+import os
+import time
+from typing import Optional
+
+def count_animations(output_dir) -> int:
+    """Number of rendered .mp4 files in output_dir"""
+    with os.scandir(output_dir) as it:
+        return sum(1 for entry in it if entry.name.endswith(".mp4"))
+
+def scan_and_unlink(output_dir, max_age: float = 3600, index: Optional[dict] = None) -> int:
+    """
+    Delete renders older than max_age seconds in a single scandir pass; DirEntry
+    caches the stat so each file costs one syscall. Ids of deleted renders
+    (files are named <animation_id>.mp4) are dropped from index when given.
+    Returns how many animations are left.
+    """
+    cutoff = time.time() - max_age
+    remaining = 0
+    with os.scandir(output_dir) as it:
+        for entry in it:
+            if not entry.name.endswith(".mp4") or not entry.is_file(follow_symlinks=False):
+                continue
+            if entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                os.unlink(entry.path)
+                if index is not None:
+                    index.pop(entry.name[:-4], None)
+            else:
+                remaining += 1
+    return remaining
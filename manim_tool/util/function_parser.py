@@ -4,10 +4,131 @@ Converts plain English descriptions to mathematical functions
 """
 
 import re
+import ast
+import functools
 import sympy as sp
 from typing import Tuple, Optional, Dict
 import numpy as np
 
+# Function patterns for complex expressions
+PATTERNS = {
+    r'(\w+)\s+squared': r'\1**2',
+    r'(\w+)\s+cubed': r'\1**3',
+    r'(\w+)\s+to\s+the\s+(\d+)(?:st|nd|rd|th)\s+power': r'\1**\2',
+    r'(\w+)\s+raised\s+to\s+the\s+(\d+)(?:st|nd|rd|th)\s+power': r'\1**\2',
+    r'square\s+root\s+of\s+(\w+)': r'sqrt(\1)',
+    r'cube\s+root\s+of\s+(\w+)': r'(\1)**(1/3)',
+    r'(\d+)\s+times\s+(\w+)': r'\1*\2',
+    r'(\w+)\s+times\s+(\d+)': r'\1*\2',
+}
+
+# Compiled once; re's own cache only holds the most recent 512 patterns
+_COMPILED_PATTERNS = [(re.compile(p), r) for p, r in PATTERNS.items()]
+# All word-form patterns as one alternation: matches somewhere iff at least one
+# of them does, so a single scan decides whether the ordered passes are needed
+_ANY_WORD_FORM = re.compile('|'.join(f'(?:{p})' for p in PATTERNS))
+_PAREN_MUL = re.compile(r'\)\s*\(')
+# Zero-width digit/letter boundaries, e.g. "3x" -> "3*x", "x2" -> "x*2"
+_IMPLICIT_MUL = re.compile(r'(?<=\d)(?=[a-zA-Z])|(?<=[a-zA-Z])(?=\d)')
+_E_CONST = re.compile(r'\be\b')
+# Anything _convert_mathematical_notation would rewrite; when this doesn't match
+# the input is already SymPy syntax and the whole pass is a no-op
+_NEEDS_REWRITE = re.compile('|'.join(
+    [r'\^', _PAREN_MUL.pattern, _IMPLICIT_MUL.pattern, _E_CONST.pattern, _ANY_WORD_FORM.pattern]
+))
+
+# What a function description may compile to. sympify evals its input, so
+# anything else (attributes, subscripts, lambdas, keyword args, unknown calls)
+# is refused. Comparisons and tuples are here for Piecewise((x, x < 0), (1, True))
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Constant, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Pow, ast.Mod, ast.USub, ast.UAdd,
+    ast.Compare, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq, ast.Tuple,
+)
+_ALLOWED_CALLS = frozenset({
+    'sin', 'cos', 'tan', 'sec', 'csc', 'cot', 'asin', 'acos', 'atan', 'atan2',
+    'asec', 'acsc', 'acot', 'sinc',
+    'sinh', 'cosh', 'tanh', 'sech', 'csch', 'coth', 'asinh', 'acosh', 'atanh',
+    'exp', 'log', 'ln', 'sqrt', 'cbrt', 'root', 'Abs', 'abs', 'sign',
+    'floor', 'ceiling', 'frac', 'Min', 'Max', 'factorial', 'factorial2', 'gamma', 'erf', 'erfc',
+    're', 'im', 'arg', 'conjugate', 'Heaviside', 'DiracDelta', 'Piecewise',
+    'besselj', 'bessely', 'besseli', 'besselk', 'binomial', 'zeta',
+})
+
+def _rewrite_factorials(desc: str) -> str:
+    """
+    Spell postfix factorials as calls ("x!" -> "factorial(x)", "n!!" ->
+    "factorial2(n)") the way SymPy's parser reads them, so the AST gate can
+    see them. The operand is the name, number or parenthesised group (with
+    any function name in front) right before the "!".
+    """
+    i = desc.find('!')
+    while i != -1:
+        double = desc.startswith('!!', i)
+        end = i + (2 if double else 1)
+        if desc.startswith('=', end):
+            # "!=" is a comparison, not a factorial; leave it to the gate
+            i = desc.find('!', end)
+            continue
+        j = i
+        while j > 0 and desc[j - 1].isspace():
+            j -= 1
+        operand_end = j
+        if j > 0 and desc[j - 1] == ')':
+            depth = 0
+            while j > 0:
+                j -= 1
+                if desc[j] == ')':
+                    depth += 1
+                elif desc[j] == '(':
+                    depth -= 1
+                    if depth == 0:
+                        break
+            if depth != 0:
+                return desc
+        while j > 0 and (desc[j - 1].isalnum() or desc[j - 1] in '_.'):
+            j -= 1
+        if j == operand_end:
+            # Nothing to apply it to; the gate reports the syntax error
+            return desc
+        call = 'factorial2' if double else 'factorial'
+        replacement = f'{call}({desc[j:operand_end]})'
+        desc = desc[:j] + replacement + desc[end:]
+        i = desc.find('!', j + len(replacement))
+    return desc
+
+def _check_syntax(desc: str):
+    """
+    Reject anything but arithmetic and comparisons on names, numbers and the
+    functions in _ALLOWED_CALLS; the error names the rejected construct
+    """
+    tree = ast.parse(desc, mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax: {type(node).__name__} in {ast.unparse(node) if isinstance(node, ast.expr) else desc!r}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _ALLOWED_CALLS:
+                raise ValueError(
+                    f"Unsupported function call: {ast.unparse(node.func)} "
+                    f"(supported: {', '.join(sorted(_ALLOWED_CALLS))})"
+                )
+            if node.keywords:
+                raise ValueError(f"Keyword arguments are not supported: {ast.unparse(node)}")
+        elif isinstance(node, ast.Name) and node.id.startswith('_'):
+            raise ValueError(f"Unsupported name: {node.id}")
+        elif isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Unsupported constant: {node.value!r}")
+
+def polynomial_evaluator(expr, x):
+    """
+    Horner-scheme callable (np.polyval) for a polynomial in x, or None when expr
+    isn't one; skips lambdify's code generation for the common case
+    """
+    if not (expr.free_symbols <= {x} and expr.is_polynomial(x)):
+        return None
+    coeffs = np.array([float(c) for c in sp.Poly(expr, x).all_coeffs()])
+    return lambda xs: np.polyval(coeffs, xs)
+
 class FunctionParser:
     """Parse natural language descriptions into mathematical functions"""
     
@@ -35,85 +156,26 @@ class FunctionParser:
         }
         
         # Function patterns for complex expressions
-        self.patterns = {
-            r'(\w+)\s+squared': r'\1**2',
-            r'(\w+)\s+cubed': r'\1**3',
-            r'(\w+)\s+to\s+the\s+(\d+)(?:st|nd|rd|th)\s+power': r'\1**\2',
-            r'(\w+)\s+raised\s+to\s+the\s+(\d+)(?:st|nd|rd|th)\s+power': r'\1**\2',
-            r'square\s+root\s+of\s+(\w+)': r'sqrt(\1)',
-            r'cube\s+root\s+of\s+(\w+)': r'(\1)**(1/3)',
-            r'(\d+)\s+times\s+(\w+)': r'\1*\2',
-            r'(\w+)\s+times\s+(\d+)': r'\1*\2',
-        }
+        self.patterns = PATTERNS
     
     def parse_function(self, description: str) -> Tuple[bool, str, str, str]:
         """
         Parse mathematical function expression (e.g., "x^2 + 3x + 2")
         
+        Results are memoized by description; see cache_info/clear_cache.
+        
         Returns:
             (success, parsed_function, function_type, latex_expression)
         """
-        try:
-            # Clean and normalize the description
-            desc = description.strip()
-            
-            # Handle function notation like "f(x) = x^2 + 3x + 2"
-            if '=' in desc:
-                desc = desc.split('=')[1].strip()
-            
-            # Convert common mathematical notation
-            desc = self._convert_mathematical_notation(desc)
-            
-            # Parse with SymPy
-            x = sp.Symbol('x')
-            expr = sp.sympify(desc)
-            
-            # Generate LaTeX
-            latex_expr = sp.latex(expr)
-            
-            # Determine function type
-            func_type = self._determine_function_type(expr)
-            
-            return True, str(expr), func_type, latex_expr
-            
-        except Exception as e:
-            return False, "", "unknown", str(e)
+        return _parse_cached(description)
     
-    def _convert_mathematical_notation(self, desc: str) -> str:
-        """Convert standard mathematical notation to Python/SymPy format"""
-        
-        # Replace ^ with ** for exponentiation
-        desc = desc.replace('^', '**')
-        
-        # Handle parentheses multiplication (e.g., "(x+1)(x+2)" -> "(x+1)*(x+2)")
-        desc = re.sub(r'\)\s*\(', ')*(', desc)
-        
-        # Handle implicit multiplication (e.g., "3x" -> "3*x", "x2" -> "x*2")
-        # But preserve function names like sin, cos, exp, log, sqrt
-        desc = re.sub(r'(\d+)([a-zA-Z])', r'\1*\2', desc)  # 3x -> 3*x
-        desc = re.sub(r'([a-zA-Z])(\d+)', r'\1*\2', desc)  # x2 -> x*2
-        
-        # Handle common mathematical constants
-        # Replace standalone constant e with E, but do not alter function names like exp
-        desc = desc.replace('pi', 'pi')
-        desc = re.sub(r'\be\b', 'E', desc)
-        
-        return desc
+    def cache_info(self):
+        """Hit/miss statistics for the parse cache"""
+        return _parse_cached.cache_info()
     
-    def _determine_function_type(self, expr) -> str:
-        """Determine the type of mathematical function"""
-        expr_str = str(expr)
-        
-        if any(func in expr_str for func in ['sin', 'cos', 'tan', 'asin', 'acos', 'atan']):
-            return 'trigonometric'
-        elif any(func in expr_str for func in ['exp', 'log', 'ln']):
-            return 'exponential_logarithmic'
-        elif '**' in expr_str and not any(func in expr_str for func in ['sin', 'cos', 'tan', 'exp', 'log']):
-            return 'polynomial'
-        elif 'sqrt' in expr_str:
-            return 'radical'
-        else:
-            return 'algebraic'
+    def clear_cache(self):
+        """Drop all memoized parse results"""
+        _parse_cached.cache_clear()
     
     def get_function_examples(self) -> Dict[str, list]:
         """Get examples of supported function descriptions"""
@@ -152,6 +214,83 @@ class FunctionParser:
             ]
         }
 
+
+@functools.lru_cache(maxsize=1024)
+def _parse_cached(description: str) -> Tuple[bool, str, str, str]:
+    """Parse a description; pure in its argument, so safe to memoize"""
+    try:
+        # Clean and normalize the description
+        desc = description.strip()
+        
+        # Handle function notation like "f(x) = x^2 + 3x + 2"
+        if '=' in desc:
+            desc = desc.split('=')[1].strip()
+        
+        # Convert common mathematical notation
+        if _NEEDS_REWRITE.search(desc):
+            desc = _convert_mathematical_notation(desc)
+        
+        # Postfix factorials aren't Python; turn them into calls first
+        if '!' in desc:
+            desc = _rewrite_factorials(desc)
+        
+        # Cheap syntax check before SymPy builds (and evals) anything
+        _check_syntax(desc)
+        
+        # Parse with SymPy
+        x = sp.Symbol('x')
+        expr = sp.sympify(desc)
+        
+        # Generate LaTeX
+        latex_expr = sp.latex(expr)
+        
+        # Determine function type
+        func_type = _determine_function_type(expr)
+        
+        return True, str(expr), func_type, latex_expr
+        
+    except Exception as e:
+        return False, "", "unknown", str(e)
+
+def _convert_mathematical_notation(desc: str) -> str:
+    """Convert standard mathematical notation to Python/SymPy format"""
+    
+    # Rewrite word forms such as "x squared" or "square root of x". Order
+    # matters (one rewrite can enable the next), so they stay separate passes
+    if _ANY_WORD_FORM.search(desc):
+        for pattern, repl in _COMPILED_PATTERNS:
+            desc = pattern.sub(repl, desc)
+    
+    # Replace ^ with ** for exponentiation
+    desc = desc.replace('^', '**')
+    
+    # Handle parentheses multiplication (e.g., "(x+1)(x+2)" -> "(x+1)*(x+2)")
+    desc = _PAREN_MUL.sub(')*(', desc)
+    
+    # Handle implicit multiplication (e.g., "3x" -> "3*x", "x2" -> "x*2")
+    # But preserve function names like sin, cos, exp, log, sqrt
+    desc = _IMPLICIT_MUL.sub('*', desc)
+    
+    # Replace standalone constant e with E, but do not alter function names like exp
+    desc = _E_CONST.sub('E', desc)
+    
+    return desc
+
+def _determine_function_type(expr) -> str:
+    """Determine the type of mathematical function"""
+    expr_str = str(expr)
+    
+    if any(func in expr_str for func in ['sin', 'cos', 'tan', 'asin', 'acos', 'atan']):
+        return 'trigonometric'
+    elif any(func in expr_str for func in ['exp', 'log', 'ln']):
+        return 'exponential_logarithmic'
+    elif '**' in expr_str and not any(func in expr_str for func in ['sin', 'cos', 'tan', 'exp', 'log']):
+        return 'polynomial'
+    elif 'sqrt' in expr_str:
+        return 'radical'
+    else:
+        return 'algebraic'
+
 # Test the parser
 if __name__ == "__main__":
     parser = FunctionParser()
@@ -0,0 +1,247 @@
+"""
+Manim scene for function animations
+
+Kept apart from manim_engine so importing the engine doesn't import Manim;
+the engine pulls this module in the first time it renders.
+"""
+
+import functools
+import numpy as np
+import sympy as sp
+from typing import Optional
+
+from manim import *
+
+from .function_parser import polynomial_evaluator
+
+# Configure Manim for high-quality output
+config.quality = "high_quality"
+config.output_file = "animation"
+config.pixel_width = 1920
+config.pixel_height = 1080
+config.frame_rate = 30
+
+@functools.lru_cache(maxsize=256)
+def _compile_expr(src: str):
+    """sympify + lambdify a parsed function once; both scene steps reuse the result"""
+    x = sp.Symbol('x')
+    expr = sp.sympify(src)
+    poly = polynomial_evaluator(expr, x)
+    if poly is not None:
+        return expr, poly
+    return expr, sp.lambdify(x, expr, modules=['numpy', 'math'])
+
+class FunctionAnimationScene(Scene):
+    """Manim scene for animating mathematical functions"""
+    
+    def __init__(
+        self,
+        function_description: str = '',
+        parsed_function: str = '',
+        function_type: str = '',
+        latex_expression: str = '',
+        domain: Optional[list] = None,
+        range_vals: Optional[list] = None,
+        duration: float = 3.0,
+        show_grid: bool = True,
+        show_axes: bool = True,
+        show_labels: bool = True,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.function_description = function_description
+        self.parsed_function = parsed_function
+        self.function_type = function_type
+        self.latex_expression = latex_expression
+        self.domain = domain if domain is not None else [-5, 5]
+        self.range_vals = range_vals
+        self.duration = duration
+        self.show_grid = show_grid
+        self.show_axes = show_axes
+        self.show_labels = show_labels
+    
+    @functools.cached_property
+    def compiled_func(self):
+        """NumPy callable for parsed_function, compiled once per scene"""
+        return _compile_expr(self.parsed_function)[1]
+    
+    @functools.cached_property
+    def y_range(self):
+        """(y_min, y_max) for the axes, sampled once per scene"""
+        return self._calculate_y_range()
+    
+    def construct(self):
+        """Main animation construction"""
+        # Create coordinate system
+        axes = self._create_axes()
+        
+        # Create function graph
+        graph = self._create_function_graph(axes)
+        
+        # Create labels and annotations
+        labels = self._create_labels(axes)
+        
+        # Animation sequence
+        self._animate_sequence(axes, graph, labels)
+    
+    def _create_axes(self):
+        """Create coordinate axes with grid"""
+        # Determine y range
+        y_min, y_max = self.y_range
+        
+        # Spans drive both the tick step (1/10) and the labelled numbers (1/5)
+        x_min, x_max = self.domain[0], self.domain[1]
+        dx, dy = x_max - x_min, y_max - y_min
+        
+        # Create axes
+        axes = Axes(
+            x_range=[x_min, x_max, dx / 10],
+            y_range=[y_min, y_max, dy / 10],
+            x_length=12,
+            y_length=8,
+            axis_config={"color": BLUE, "stroke_width": 2},
+            x_axis_config={
+                "numbers_to_include": np.arange(x_min, x_max + 1, max(1, dx // 5)),
+                "font_size": 24,
+                "decimal_number_config": {"num_decimal_places": 0}
+            },
+            y_axis_config={
+                "numbers_to_include": np.arange(y_min, y_max + 1, max(1, dy // 5)),
+                "font_size": 24,
+                "decimal_number_config": {"num_decimal_places": 0}
+            },
+            tips=False,
+        )
+        
+        # Add grid if requested
+        if self.show_grid:
+            axes.add_coordinates()
+        
+        return axes
+    
+    def _create_function_graph(self, axes):
+        """Create the function graph"""
+        try:
+            # Convert parsed function to lambda
+            func = self.compiled_func
+            
+            # Sample the curve in one vectorized call and transform all points at
+            # once, instead of letting axes.plot call func point by point
+            xs = np.linspace(self.domain[0], self.domain[1], 400)
+            with np.errstate(all='ignore'):
+                ys = np.broadcast_to(np.asarray(func(xs), dtype=np.float64), xs.shape)
+            if np.isfinite(ys).all():
+                graph = VMobject(color=YELLOW, stroke_width=4)
+                graph.set_points_smoothly(axes.coords_to_point(np.column_stack([xs, ys])))
+                return graph
+            
+            # Gaps or poles: a single smooth path would bridge them, so let
+            # axes.plot handle the curve
+            graph = axes.plot(
+                func,
+                color=YELLOW,
+                x_range=[self.domain[0], self.domain[1]],
+                stroke_width=4
+            )
+            
+            return graph
+            
+        except Exception as e:
+            # Fallback: create a simple line if function fails
+            return axes.plot(lambda x: 0, color=YELLOW, x_range=[self.domain[0], self.domain[1]])
+    
+    def _create_labels(self, axes):
+        """Create labels and annotations"""
+        labels = VGroup()
+        if not self.show_labels:
+            return labels
+        
+        # Axis labels
+        x_label = axes.get_x_axis_label("x", edge=DOWN, direction=DOWN, buff=0.5)
+        y_label = axes.get_y_axis_label("f(x)", edge=LEFT, direction=LEFT, buff=0.5)
+        labels.add(x_label, y_label)
+        
+        # The description sits under the equation, or under the y label without one
+        anchor = y_label
+        
+        # Function equation
+        if self.latex_expression:
+            equation = MathTex(f"f(x) = {self.latex_expression}", font_size=36)
+            # pyrefly: ignore  # unknown-name
+            equation.set_color(CYAN)
+            equation.to_corner(UL, buff=1)
+            labels.add(equation)
+            anchor = equation
+        
+        # Function description
+        description = Text(self.function_description, font_size=24)
+        description.set_color(WHITE)
+        description.next_to(anchor, DOWN, aligned_edge=LEFT)
+        labels.add(description)
+        
+        return labels
+    
+    def _animate_sequence(self, axes, graph, labels):
+        """Create the animation sequence"""
+        # Short clips can't fit the staged 1s + 1s + graph + 1s sequence (the graph
+        # would get a zero or negative run_time); draw everything together instead
+        if self.duration < 2.5:
+            parts = [Create(axes)] if self.show_axes else []
+            if labels.submobjects:
+                parts.append(Write(labels))
+            parts.append(Create(graph))
+            self.play(AnimationGroup(*parts, lag_ratio=0.1), run_time=max(0.5, self.duration - 0.5))
+            self.wait(0.5)
+            return
+        
+        # 1. Show axes
+        if self.show_axes:
+            self.play(Create(axes), run_time=1)
+        
+        # 2. Show labels
+        if labels.submobjects:
+            self.play(Write(labels), run_time=1)
+        
+        # 3. Animate function drawing
+        # pyrefly: ignore  # unsupported-operation
+        self.play(Create(graph), run_time=self.duration - 2)
+        
+        # 4. Hold final frame
+        self.wait(1)
+    
+    def _calculate_y_range(self):
+        """Calculate appropriate y range for the function"""
+        if self.range_vals:
+            return self.range_vals[0], self.range_vals[1]
+        
+        try:
+            # Sample function values to determine range
+            x_vals = np.linspace(self.domain[0], self.domain[1], 1000)
+            func = self.compiled_func
+            
+            with np.errstate(all='ignore'):
+                try:
+                    # One vectorized call; constants come back as a scalar
+                    y_vals = np.array(np.broadcast_to(np.asarray(func(x_vals), dtype=np.float64), x_vals.shape))
+                except (TypeError, ValueError):
+                    # Not vectorizable (e.g. resolved to math.*); sample point by point
+                    y_vals = np.empty_like(x_vals)
+                    for i, x_val in enumerate(x_vals):
+                        try:
+                            y_vals[i] = func(x_val)
+                        except Exception:
+                            y_vals[i] = np.nan
+            
+            # Blank out inf in place and let nanmin/nanmax skip it, rather than
+            # building a filtered copy
+            finite = np.isfinite(y_vals)
+            if finite.any():
+                y_vals[~finite] = np.nan
+                y_min, y_max = float(np.nanmin(y_vals)), float(np.nanmax(y_vals))
+                y_range = y_max - y_min
+                return y_min - 0.1 * y_range, y_max + 0.1 * y_range
+            else:
+                return -10, 10
+                
+        except:
+            return -10, 10
@@ -1,17 +1,26 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional, Dict, Any
 
 class AnimationRequest(BaseModel):
     """Request model for generating mathematical animations"""
     function_description: str = Field(..., description="Mathematical function expression (e.g., 'x^2 + 3x + 2', 'sin(x)', 'exp(x)', 'f(x) = x^3 - 2x + 1')")
-    domain: List[float] = Field(..., description="Domain range [min, max] for the function")
-    range_vals: Optional[List[float]] = Field(None, alias="range", description="Optional range values [min, max] for y-axis")
+    domain: tuple[float, float] = Field(..., description="Domain range [min, max] for the function")
+    range_vals: Optional[tuple[float, float]] = Field(None, description="Optional range values [min, max] for y-axis (also accepted as \"range\")")
     duration: float = Field(default=3.0, description="Animation duration in seconds")
     quality: str = Field(default="medium", description="Video quality: low, medium, high")
     show_grid: bool = Field(default=True, description="Show coordinate grid")
     show_axes: bool = Field(default=True, description="Show coordinate axes")
     show_labels: bool = Field(default=True, description="Show axis labels and function equation")
 
+    @model_validator(mode="before")
+    @classmethod
+    def _rename_range(cls, data: Any) -> Any:
+        # Clients send "range"; rename it once here instead of aliasing the field
+        if isinstance(data, dict) and "range" in data and "range_vals" not in data:
+            data = dict(data)
+            data["range_vals"] = data.pop("range")
+        return data
+
 class AnimationResponse(BaseModel):
     """Response model for animation generation"""
     animation_id: str
@@ -47,5 +56,5 @@ class JSONAnimationRequest(BaseModel):
     """Request model matching the JSON-driven animator"""
     type: str = Field(..., description="Animation type: riemann_sum | derivative | integral | linear_system")
     function: Optional[str] = Field(None, description="Function expression for applicable types (e.g., 'x^2', 'sin(x)')")
-    domain: List[float] = Field(..., description="Domain range [min, max] for x")
+    domain: tuple[float, float] = Field(..., description="Domain range [min, max] for x")
     options: Optional[JSONAnimationOptions] = Field(None, description="Additional options per animation type")
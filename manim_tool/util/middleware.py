@@ -0,0 +1,22 @@
+"""
+ASGI middleware shared by the FastAPI apps
+"""
+
+from starlette.middleware.gzip import GZipMiddleware
+
+class JSONGZipMiddleware:
+    """
+    GZip responses, except the video routes: MP4 doesn't compress, and
+    re-encoding the body would break the Range responses FileResponse serves.
+    """
+
+    def __init__(self, app, minimum_size: int = 500, skip_prefixes: tuple = ("/download", "/latest")):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+        self.skip_prefixes = skip_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.skip_prefixes):
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
@@ -0,0 +1,58 @@
+"""
+Render worker processes
+Pool entry points live here rather than in the FastAPI module, so worker
+processes import the renderers without building the app
+"""
+
+import os
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# Manim renders are CPU-bound; leave one core for the event loop
+RENDER_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+_engine = None
+
+def warm_worker():
+    """Pool initializer: pay the manim/sympy import cost once per worker, not per render"""
+    import manim  # noqa: F401
+    import sympy  # noqa: F401
+    # The scenes live in these modules; importing them here builds their Scene
+    # subclasses and parser tables before the first job
+    import util.function_scene  # noqa: F401
+    import working_json_animator  # noqa: F401
+    sympy.lambdify(sympy.Symbol("x"), sympy.sympify("x**2"), modules="numpy")
+
+def init_media_dir():
+    """
+    Pool initializer: a per-process Manim media_dir, so concurrent workers never
+    share partial movie files or ffmpeg outputs
+    """
+    from manim import config
+    config.media_dir = os.path.join("media", f"worker-{os.getpid()}")
+
+def noop():
+    """Submitted once per worker at startup so the pool spawns them eagerly"""
+    pass
+
+def render_function_batch(batch: list):
+    """Render several animations in one worker round-trip, on this worker's own engine"""
+    global _engine
+    if _engine is None:
+        from util.manim_engine import ManimAnimationEngine
+        _engine = ManimAnimationEngine()
+    return [_engine.create_animation(**params) for params in batch]
+
+def create_render_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Process pool for renders. forkserver children start from a server that
+    already has manim imported, and avoid forking the uvicorn process itself;
+    spawn where forkserver is unsupported.
+    """
+    if "forkserver" in mp.get_all_start_methods():
+        ctx = mp.get_context("forkserver")
+        ctx.set_forkserver_preload(["manim", "sympy", "numpy"])
+    else:
+        ctx = mp.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers or RENDER_WORKERS, mp_context=ctx, initializer=warm_worker)
@@ -0,0 +1,30 @@
+"""
+Video post-processing helpers
+"""
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+FFMPEG = shutil.which("ffmpeg")
+
+def faststart(path) -> bool:
+    """
+    Move the MP4 moov atom to the front of the file so browsers can start
+    playback from the first range request. Remuxes only, no re-encode.
+    """
+    if FFMPEG is None:
+        return False
+    src = Path(path)
+    tmp = src.with_name(f"{src.stem}.faststart{src.suffix}")
+    result = subprocess.run(
+        [FFMPEG, "-y", "-v", "error", "-i", str(src), "-c", "copy", "-movflags", "+faststart", str(tmp)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if result.returncode != 0:
+        tmp.unlink(missing_ok=True)
+        return False
+    os.replace(tmp, src)
+    return True
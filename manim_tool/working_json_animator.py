@@ -4,19 +4,245 @@ Fixed version that actually creates working animations
 """
 
 import json
+import os
 import uuid
+import hashlib
+import shutil
+import functools
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import sympy as sp
+from scipy.integrate import quad
 from pathlib import Path
 from typing import Dict, Any, List
 from manim import *
 from util.function_parser import FunctionParser
+from util.video import faststart
+from util.render_worker import init_media_dir
 
 import traceback
 
-def create_working_animation_from_json(json_input: Dict[str, Any]) -> tuple[bool, str, str]:
+# Renders keyed by a hash of the request JSON; identical requests reuse them
+CACHE_DIR = Path("animations/cache")
+
+# Shared by every scene instead of being rebuilt inside construct()
+_PARSER = FunctionParser()
+_X = sp.Symbol('x')
+_Y = sp.Symbol('y')
+
+@functools.lru_cache(maxsize=256)
+def _get_lambdified(function_str: str):
+    """
+    Parse, sympify and lambdify a function string once per distinct string.
+    
+    Returns (success, parsed_func_or_error, expr, func, latex_expr).
+    """
+    success, parsed_func, func_type, latex_expr = _PARSER.parse_function(function_str)
+    if not success:
+        return False, parsed_func, None, None, latex_expr
+    expr = sp.sympify(parsed_func)
+    func = sp.lambdify(_X, expr, modules=['numpy', 'math'], cse=True)
+    return True, parsed_func, expr, func, latex_expr
+
+@functools.lru_cache(maxsize=256)
+def _get_derivative_lambdified(function_str: str):
+    """Symbolic derivative of a (successfully parsed) function string and its callable"""
+    _, _, expr, _, _ = _get_lambdified(function_str)
+    derivative = sp.diff(expr, _X)
+    # Use sympy and numpy printers; allow non-strict to handle composite forms
+    derivative_func = sp.lambdify(_X, derivative, modules=['numpy', {'sin': np.sin, 'cos': np.cos, 'tan': np.tan, 'exp': np.exp, 'log': np.log, 'sqrt': np.sqrt}], dummify=False, cse=True)
+    return derivative, derivative_func
+
+@functools.lru_cache(maxsize=256)
+def _diff_latex(function_str: str) -> str:
+    """LaTeX source of the derivative, printed once per function string"""
+    derivative, _ = _get_derivative_lambdified(function_str)
+    return sp.latex(derivative)
+
+@functools.lru_cache(maxsize=256)
+def _get_fused_lambdified(function_str: str):
+    """f and f' as one callable returning both, sharing common subexpressions"""
+    _, _, expr, _, _ = _get_lambdified(function_str)
+    derivative, _ = _get_derivative_lambdified(function_str)
+    return sp.lambdify(_X, [expr, derivative], modules='numpy', cse=True)
+
+@functools.lru_cache(maxsize=256)
+def _get_scalar_lambdified(function_str: str):
+    """
+    math-module callables for f and f' at single points. numpy-mode functions
+    pay 0-d array overhead on scalars; those stay in use for array sampling.
+    Falls back to the numpy-mode callables if math can't express the function.
+    """
+    _, _, expr, func, _ = _get_lambdified(function_str)
+    derivative, derivative_func = _get_derivative_lambdified(function_str)
+    try:
+        return sp.lambdify(_X, expr, 'math'), sp.lambdify(_X, derivative, 'math')
+    except Exception:
+        return func, derivative_func
+
+def _definite_integral(func, expr, domain) -> float:
+    """Integral over domain by adaptive quadrature; symbolic only if that fails"""
+    a, b = float(domain[0]), float(domain[1])
+    try:
+        with np.errstate(all='ignore'):
+            value, _ = quad(lambda x: float(func(x)), a, b)
+        if np.isfinite(value):
+            return value
+    except Exception:
+        pass
+    return float(sp.integrate(expr, (_X, a, b)).evalf())
+
+@functools.lru_cache(maxsize=256)
+def _math_tex(tex: str) -> MathTex:
+    """MathTex built once per string; callers must copy before positioning it"""
+    return MathTex(tex)
+
+@functools.lru_cache(maxsize=64)
+def _cached_axes(x_range: tuple, y_range: tuple) -> Axes:
+    """Axes built once per range pair; get copies through _axes_for"""
+    return Axes(x_range=list(x_range), y_range=list(y_range), axis_config={'include_tip': True})
+
+def _x_range(domain) -> tuple:
+    """Hashable [min, max, step] over domain with ten ticks"""
+    return (float(domain[0]), float(domain[1]), (domain[1] - domain[0]) / 10)
+
+def _axes_for(domain, y_range) -> Axes:
+    """Copy of the cached axes for this domain and y_range, free to mutate"""
+    return _cached_axes(_x_range(domain), tuple(float(v) for v in y_range)).copy()
+
+@functools.lru_cache(maxsize=128)
+def _cached_curve(function_str: str, x_range: tuple, y_range: tuple):
+    """f(x) plotted on the cached axes; get copies through _curve_for"""
+    _, _, _, func, _ = _get_lambdified(function_str)
+    return _cached_axes(x_range, y_range).plot(lambda x: func(x), color=BLUE, stroke_width=3)
+
+def _curve_for(function_str: str, domain, y_range):
+    """
+    Copy of the f(x) curve on _axes_for(domain, y_range), tessellated once per
+    function and ranges. Axes copies share geometry, so it lines up with them.
+    """
+    return _cached_curve(function_str, _x_range(domain), tuple(float(v) for v in y_range)).copy()
+
+@functools.lru_cache(maxsize=512)
+def _cached_text(text: str, font_size: float, color: str) -> Text:
+    """Pango-laid-out Text, built once per (text, size, hex colour)"""
+    return Text(text, font_size=font_size, color=color)
+
+def _text(text: str, font_size: float = 24, color=WHITE) -> Text:
+    """Copy of the cached Text; safe to position and animate"""
+    return _cached_text(text, font_size, ManimColor(color).to_hex()).copy()
+
+def _sampled_curve(ax, xs: np.ndarray, ys, fallback, **style):
+    """
+    Curve through precomputed samples, transformed to scene points in one call.
+    Falls back to ax.plot(fallback) when the samples aren't all finite.
+    """
+    ys = np.broadcast_to(np.asarray(ys, dtype=np.float64), xs.shape)
+    if not np.isfinite(ys).all():
+        return ax.plot(fallback, **style)
+    curve = VMobject(**style)
+    curve.set_points_smoothly(ax.coords_to_point(np.column_stack([xs, ys])))
+    return curve
+
+@functools.lru_cache(maxsize=512)
+def _parse_line(equation: str):
     """
-    Create working animation from JSON input
+    Sympify a linear-system equation once per distinct string.
+    
+    Returns (lhs - rhs, y as a function of x, its callable), or None when the
+    equation has no '=' or can't be solved for y.
+    """
+    if '=' not in equation:
+        return None
+    left, right = equation.split('=')
+    # Keep lhs - rhs for the intersection step
+    # pyrefly: ignore  # unsupported-operation
+    expr = sp.sympify(left) - sp.sympify(right)
+    if 'y' in left and 'x' not in left:
+        # Explicit form: y = f(x)
+        y_expr = sp.sympify(right)
+    else:
+        # Implicit form: ax + by = c or ax + by + c = 0
+        solutions = sp.solve(expr, _Y)
+        if not solutions:
+            return None
+        y_expr = solutions[0]
+    func = sp.lambdify(_X, y_expr, modules=['numpy', 'math'], cse=True)
+    return expr, y_expr, func
+
+def _finite_samples(func, x_vals: np.ndarray) -> np.ndarray:
+    """Finite values of func over x_vals, evaluated in one vectorized call when possible"""
+    with np.errstate(all='ignore'):
+        try:
+            y_vals = np.broadcast_to(np.asarray(func(x_vals), dtype=np.float64), x_vals.shape)
+        except (TypeError, ValueError):
+            # Not vectorizable; sample point by point
+            y_vals = np.empty_like(x_vals)
+            for i, xv in enumerate(x_vals):
+                try:
+                    y_vals[i] = func(xv)
+                except Exception:
+                    y_vals[i] = np.nan
+    return y_vals[np.isfinite(y_vals)]
+
+def _render(scene_cls, output_file: str, animation_id: str, quality: str = "medium_quality") -> tuple[bool, str, str]:
+    """
+    Render a scene at the given Manim quality to output_file. The path comes from the
+    scene's own file writer rather than a glob over the videos directory.
+    """
+    # Partial movie files otherwise go to a per-scene-class directory, which
+    # concurrent renders of the same scene would share (and prune under each other)
+    partial_dir = Path(config.media_dir) / "partial_movie_files" / animation_id
+    try:
+        with tempconfig({"quality": quality, "output_file": output_file, "partial_movie_dir": str(partial_dir)}):
+            scene = scene_cls()
+            scene.render()
+            movie = Path(scene.renderer.file_writer.movie_file_path)
+    finally:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+    if movie.exists():
+        return True, animation_id, str(movie)
+    return False, animation_id, "Output file not found"
+
+def _cache_key(json_input: Dict[str, Any]) -> str:
+    """Stable hash of a JSON animation request"""
+    canonical = json.dumps(json_input, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def create_cached_animation_from_json(json_input: Dict[str, Any]) -> tuple[bool, str, str]:
+    """
+    Same contract as create_working_animation_from_json, but skips Manim entirely
+    when an identical request has already been rendered.
+
+    The animation id of a cached render is the request hash.
+    """
+    key = _cache_key(json_input)
+    cached = CACHE_DIR / f"{key}.mp4"
+    if cached.exists():
+        try:
+            # mtime doubles as last use, so cache pruning evicts the coldest renders
+            os.utime(cached)
+        except OSError:
+            pass
+        return True, key, str(cached)
+
+    success, animation_id, file_path = create_working_animation_from_json(json_input)
+    if not success:
+        return success, animation_id, file_path
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(file_path, cached)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copyfile(file_path, cached)
+    return True, key, str(cached)
+
+def create_working_animation_from_json(json_input: Dict[str, Any], quality: str = "medium_quality") -> tuple[bool, str, str]:
+    """
+    Create working animation from JSON input, rendered at the given Manim
+    quality preset (e.g. "low_quality" for quick previews)
     
     Expected JSON format:
     {
@@ -42,17 +268,17 @@ def create_working_animation_from_json(json_input: Dict[str, Any]) -> tuple[bool
         animation_id = str(uuid.uuid4())[:8]
         
         if animation_type == "riemann_sum":
-            return _create_working_riemann_sum(function, domain, options, animation_id)
+            result = _create_working_riemann_sum(function, domain, options, animation_id, quality)
         elif animation_type == "derivative":
-            return _create_working_derivative(function, domain, options, animation_id)
+            result = _create_working_derivative(function, domain, options, animation_id, quality)
         elif animation_type == "linear_system":
             if options:
                 equations = options.get("equations", ["y = 2*x + 1", "y = -x + 4"])
             else:
                 equations = ["y=2*x+1","y=-x+4"]
-            return _create_working_linear_system(equations, domain, animation_id)
+            result = _create_working_linear_system(equations, domain, animation_id, quality)
         elif animation_type == "integral":
-            return _create_working_integral(function, domain, options, animation_id)
+            result = _create_working_integral(function, domain, options, animation_id, quality)
         elif animation_type in ("equation", "equation_display"):
             equations = options.get("equations") if options else None
             # Fallback: if only a single function/equation string is provided
@@ -60,15 +286,37 @@ def create_working_animation_from_json(json_input: Dict[str, Any]) -> tuple[bool
                 equations = [function]
             if not equations:
                 return False, "", "No equations provided for equation display"
-            return _create_working_equation_display(equations, animation_id)
+            result = _create_working_equation_display(equations, animation_id, quality)
         else:
             return False, "", f"Unknown animation type: {animation_type}"
+        
+        # Put moov first so /latest and /download start playing after one range request
+        if result[0]:
+            faststart(result[2])
+        return result
             
     except Exception as e:
         print(traceback.format_exc())
         return False, "", str(e)
 
-def _create_working_riemann_sum(function: str, domain: List[float], options: Dict[str, Any], animation_id: str) -> tuple[bool, str, str]:
+def create_many(json_inputs: List[Dict[str, Any]], quality: str = "medium_quality") -> List[tuple[bool, str, str]]:
+    """
+    Render several JSON requests in this process, one result per input in order.
+    
+    Manim, the fonts and the parse/lambdify/MathTex caches are loaded once and
+    shared by every render instead of paying that startup per request.
+    """
+    return [create_working_animation_from_json(json_input, quality) for json_input in json_inputs]
+
+def create_animations_parallel(json_inputs: List[Dict[str, Any]], workers: int | None = None, quality: str = "medium_quality") -> List[tuple[bool, str, str]]:
+    """
+    Render independent JSON requests across worker processes. Results come back
+    in input order; each worker writes under its own media_dir.
+    """
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=init_media_dir) as pool:
+        return list(pool.map(functools.partial(create_working_animation_from_json, quality=quality), json_inputs))
+
+def _create_working_riemann_sum(function: str, domain: List[float], options: Dict[str, Any], animation_id: str, quality: str = "medium_quality") -> tuple[bool, str, str]:
     """Create working Riemann sum animation"""
     # Resolve options in outer scope so we can use them for naming/output
     sum_type = options.get("sum_type", "right")
@@ -77,34 +325,26 @@ def _create_working_riemann_sum(function: str, domain: List[float], options: Dic
     class WorkingRiemannScene(Scene):
         def construct(self):
             # Parse function
-            parser = FunctionParser()
-            success, parsed_func, func_type, latex_expr = parser.parse_function(function)
+            success, parsed_func, expr, func, latex_expr = _get_lambdified(function)
             
             if not success:
-                error_text = Text(f"Error: {parsed_func}", font_size=24, color=RED)
+                error_text = _text(f"Error: {parsed_func}", font_size=24, color=RED)
                 self.add(error_text)
                 self.wait(2)
                 return
             
             # Calculate y range
             x_vals = np.linspace(domain[0], domain[1], 100)
-            x = sp.Symbol('x')
-            expr = sp.sympify(parsed_func)
-            func = sp.lambdify(x, expr, modules=['numpy', 'math'])
             
-            y_vals = [func(x_val) for x_val in x_vals if not (np.isnan(func(x_val)) or np.isinf(func(x_val)))]
-            y_min, y_max = min(y_vals), max(y_vals)
+            y_vals = _finite_samples(func, x_vals)
+            y_min, y_max = (float(y_vals.min()), float(y_vals.max())) if y_vals.size else (-1.0, 1.0)
             y_range = [y_min - 0.2 * (y_max - y_min), y_max + 0.2 * (y_max - y_min), (y_max - y_min) / 10]
             
             # Set up axes
-            ax = Axes(
-                x_range=[domain[0], domain[1], (domain[1] - domain[0]) / 10],
-                y_range=y_range,
-                axis_config={'include_tip': True},
-            )
+            ax = _axes_for(domain, y_range)
             
             # Plot the function
-            curve = ax.plot(lambda x: func(x), color=BLUE, stroke_width=3)
+            curve = _curve_for(function, domain, y_range)
             
             # Create Riemann rectangles
             dx = (domain[1] - domain[0]) / num_rectangles
@@ -119,11 +359,11 @@ def _create_working_riemann_sum(function: str, domain: List[float], options: Dic
             )
             
             # Add title
-            title = Text(f'{sum_type.title()} Riemann Sum: f(x) = {function}', 
+            title = _text(f'{sum_type.title()} Riemann Sum: f(x) = {function}', 
                        font_size=24, color=WHITE)
             title.to_edge(UP)
             
-            rect_info = Text(f'n = {num_rectangles} rectangles', font_size=16, color=BLUE)
+            rect_info = _text(f'n = {num_rectangles} rectangles', font_size=16, color=BLUE)
             rect_info.next_to(title, DOWN)
             
             # Animation sequence
@@ -135,34 +375,20 @@ def _create_working_riemann_sum(function: str, domain: List[float], options: Dic
             self.wait(2)
     
     # Configure and render (use Manim's default output system)
-    config.quality = "medium_quality"
     # Sanitize filename for filesystem
     safe_function = function.replace('^', '_pow_').replace('/', '_').replace(' ', ' ')
-    config.output_file = f"riemann_{sum_type}_{safe_function}_{animation_id}"
-    
-    scene = WorkingRiemannScene()
-    scene.render()
-    
-    # Find the actual output file
-    output_dir = Path("media/videos/720p30")
-    output_files = list(output_dir.glob(f"riemann_{sum_type}_{safe_function}_{animation_id}*"))
-    
-    if output_files:
-        return True, animation_id, str(output_files[0])
-    else:
-        return False, animation_id, "Output file not found"
+    return _render(WorkingRiemannScene, f"riemann_{sum_type}_{safe_function}_{animation_id}", animation_id, quality)
 
-def _create_working_derivative(function: str, domain: List[float], options: Dict[str, Any], animation_id: str) -> tuple[bool, str, str]:
+def _create_working_derivative(function: str, domain: List[float], options: Dict[str, Any], animation_id: str, quality: str = "medium_quality") -> tuple[bool, str, str]:
     """Create working derivative animation"""
     
     class WorkingDerivativeScene(Scene):
         def construct(self):
             # Parse function
-            parser = FunctionParser()
-            success, parsed_func, func_type, latex_expr = parser.parse_function(function)
+            success, parsed_func, expr, func, latex_expr = _get_lambdified(function)
             
             if not success:
-                error_text = Text(f"Error: {parsed_func}", font_size=24, color=RED)
+                error_text = _text(f"Error: {parsed_func}", font_size=24, color=RED)
                 self.add(error_text)
                 self.wait(2)
                 return
@@ -171,38 +397,38 @@ def _create_working_derivative(function: str, domain: List[float], options: Dict
             point = options.get("point", (domain[0] + domain[1]) / 2)
             
             # Set up axes
-            ax = Axes(
-                x_range=[domain[0], domain[1], (domain[1] - domain[0]) / 10],
-                y_range=[-10, 10, 2],
-                axis_config={'include_tip': True},
-            )
+            ax = _axes_for(domain, (-10, 10, 2))
             
             # Create function and derivative
-            x = sp.Symbol('x')
-            expr = sp.sympify(parsed_func)
-            func = sp.lambdify(x, expr, modules=['numpy', 'math'])
-            
-            derivative = sp.diff(expr, x)
-            # Use sympy and numpy printers; allow non-strict to handle composite forms
-            derivative_func = sp.lambdify(x, derivative, modules=['numpy', {'sin': np.sin, 'cos': np.cos, 'tan': np.tan, 'exp': np.exp, 'log': np.log, 'sqrt': np.sqrt}], dummify=False)
+            derivative, derivative_func = _get_derivative_lambdified(function)
             
-            # Plot the function and derivative
-            curve = ax.plot(lambda x: func(x), color=BLUE, stroke_width=3)
-            derivative_curve = ax.plot(lambda x: derivative_func(x), color=RED, stroke_width=2)
+            # Sample f and f' together and plot both from the cached arrays
+            xs = np.linspace(domain[0], domain[1], 300)
+            with np.errstate(all='ignore'):
+                ys, dys = _get_fused_lambdified(function)(xs)
+            curve = _sampled_curve(ax, xs, ys, lambda x: func(x), color=BLUE, stroke_width=3)
+            derivative_curve = _sampled_curve(ax, xs, dys, lambda x: derivative_func(x), color=RED, stroke_width=2)
             
             # Calculate tangent line
-            slope = derivative_func(point)
-            y_intercept = func(point) - slope * point
+            f_scalar, df_scalar = _get_scalar_lambdified(function)
+            slope = df_scalar(point)
+            y_point = f_scalar(point)
+            y_intercept = y_point - slope * point
             tangent_line = ax.plot(lambda x_val: slope * x_val + y_intercept, color=YELLOW, stroke_width=2)
             
             # Mark the point
-            point_dot = Dot(ax.c2p(point, func(point)), color=YELLOW, radius=0.1)
+            point_dot = Dot(ax.c2p(point, y_point), color=YELLOW, radius=0.1)
             
             # Add title
-            title = Text(f'Derivative: f(x) = {function}', font_size=24, color=WHITE)
+            title = _text(f'Derivative: f(x) = {function}', font_size=24, color=WHITE)
             title.to_edge(UP)
             
-            derivative_text = Text(f"f'(x) = {sp.latex(derivative)}", font_size=18, color=RED)
+            try:
+                derivative_text = _math_tex(r"f'(x) = " + _diff_latex(function)).copy()
+                derivative_text.font_size = 28
+                derivative_text.set_color(RED)
+            except Exception:
+                derivative_text = _text(f"f'(x) = {derivative}", font_size=18, color=RED)
             derivative_text.next_to(title, DOWN)
             
             # Animation sequence
@@ -216,78 +442,70 @@ def _create_working_derivative(function: str, domain: List[float], options: Dict
             self.wait(2)
     
     # Configure and render
-    config.quality = "medium_quality"
     safe_function = function.replace('^', '_pow_').replace('/', '_').replace(' ', ' ')
-    config.output_file = f"derivative_{safe_function}_{animation_id}"
-    
-    scene = WorkingDerivativeScene()
-    scene.render()
-    
-    # Find the actual output file
-    output_dir = Path("media/videos/720p30")
-    output_files = list(output_dir.glob(f"derivative_{safe_function}_{animation_id}*"))
-    
-    if output_files:
-        return True, animation_id, str(output_files[0])
-    else:
-        return False, animation_id, "Output file not found"
+    return _render(WorkingDerivativeScene, f"derivative_{safe_function}_{animation_id}", animation_id, quality)
 
-def _create_working_linear_system(equations: List[str], domain: List[float], animation_id: str) -> tuple[bool, str, str]:
+def _intersect(expr1, expr2):
+    """
+    Intersection of expr1 = 0 and expr2 = 0 in (x, y), or None. Two lines are
+    solved with Cramer's rule; anything nonlinear goes through sp.solve.
+    """
+    x_sym, y_sym = _X, _Y
+    try:
+        p1, p2 = sp.Poly(expr1, x_sym, y_sym), sp.Poly(expr2, x_sym, y_sym)
+        linear = p1.total_degree() <= 1 and p2.total_degree() <= 1
+    except sp.PolynomialError:
+        linear = False
+    if linear:
+        a1, b1, c1 = (float(p1.coeff_monomial(m)) for m in (x_sym, y_sym, 1))
+        a2, b2, c2 = (float(p2.coeff_monomial(m)) for m in (x_sym, y_sym, 1))
+        det = a1 * b2 - a2 * b1
+        if det == 0:
+            return None  # parallel or identical lines
+        # a*x + b*y + c = 0  ->  a*x + b*y = -c
+        return (-c1 * b2 + c2 * b1) / det, (-a1 * c2 + a2 * c1) / det
+    sol = sp.solve((expr1, expr2), (x_sym, y_sym), dict=True)
+    if not sol:
+        return None
+    # pyrefly: ignore  # bad-argument-type
+    return float(sol[0][x_sym]), float(sol[0][y_sym])
+
+def _create_working_linear_system(equations: List[str], domain: List[float], animation_id: str, quality: str = "medium_quality") -> tuple[bool, str, str]:
     """Create working linear system animation"""
     
     class WorkingLinearSystemScene(Scene):
         def construct(self):
             # Set up axes
-            ax = Axes(
-                x_range=[domain[0], domain[1], (domain[1] - domain[0]) / 10],
-                y_range=[domain[0], domain[1], (domain[1] - domain[0]) / 10],
-                axis_config={'include_tip': True},
-            )
+            ax = _axes_for(domain, _x_range(domain))
             
             # Parse equations and create lines
             lines = []
             colors = [BLUE, RED, GREEN, YELLOW, PURPLE]
+            xs = np.linspace(domain[0], domain[1], 200)
             
             for i, equation in enumerate(equations):
                 try:
-                    # Parse equation: support explicit y=..., implicit ax+by=c
-                    if '=' in equation:
-                        left, right = equation.split('=')
-                        x_sym = sp.Symbol('x')
-                        y_sym = sp.Symbol('y')
-                        
-                        if 'y' in left and 'x' not in left:
-                            # Explicit form: y = f(x)
-                            y_expr = sp.sympify(right)
-                            func = sp.lambdify(x_sym, y_expr, modules=['numpy', 'math'])
-                            color = colors[i % len(colors)]
-                            line = ax.plot(lambda x: func(x), color=color, stroke_width=2)
-                            lines.append((line, equation, color))
-                        else:
-                            # Implicit form: ax + by = c or ax + by + c = 0
-                            # pyrefly: ignore  # unsupported-operation
-                            expr = sp.sympify(left) - sp.sympify(right)
-                            try:
-                                # pyrefly: ignore  # index-error
-                                y_expr = sp.solve(expr, y_sym)[0]
-                                func = sp.lambdify(x_sym, y_expr, modules=['numpy', 'math'])
-                                color = colors[i % len(colors)]
-                                line = ax.plot(lambda x: func(x), color=color, stroke_width=2)
-                                lines.append((line, equation, color))
-                            except Exception:
-                                pass
-                            
+                    parsed = _parse_line(equation)
+                    if parsed is None:
+                        continue
+                    expr, y_expr, func = parsed
+                    color = colors[i % len(colors)]
+                    # func is passed directly, never through a closure over the loop variable
+                    with np.errstate(all='ignore'):
+                        ys = func(xs)
+                    line = _sampled_curve(ax, xs, ys, func, color=color, stroke_width=2)
+                    lines.append((line, equation, color, expr))
                 except Exception as e:
                     continue
             
             # Add title
-            title = Text('System of Linear Equations', font_size=24, color=WHITE)
+            title = _text('System of Linear Equations', font_size=24, color=WHITE)
             title.to_edge(UP)
             
             # Add equations
             equation_texts = VGroup()
-            for i, (line, equation, color) in enumerate(lines):
-                eq_text = Text(f'{i+1}. {equation}', color=color, font_size=16)
+            for i, (line, equation, color, _) in enumerate(lines):
+                eq_text = _text(f'{i+1}. {equation}', font_size=16, color=color)
                 equation_texts.add(eq_text)
             
             equation_texts.arrange(DOWN, aligned_edge=LEFT, buff=0.3)
@@ -299,26 +517,15 @@ def _create_working_linear_system(equations: List[str], domain: List[float], ani
             self.play(Write(equation_texts))
             self.play(Create(ax))
             
-            for line, equation, color in lines:
+            for line, equation, color, _ in lines:
                 self.play(Create(line), run_time=1.5)
             
             # Mark intersections if there are at least two lines
             if len(lines) >= 2:
-                x_sym = sp.Symbol('x')
-                y_sym = sp.Symbol('y')
-                eq_exprs = []
-                for _, eq_text, _ in lines:
-                    left, right = eq_text.split('=')
-                    expr = sp.sympify(left) - sp.sympify(right)
-                    eq_exprs.append(expr)
                 try:
-                    sol = sp.solve((eq_exprs[0], eq_exprs[1]), (x_sym, y_sym), dict=True)
-                    if sol:
-                        # pyrefly: ignore  # index-error, bad-argument-type
-                        sx = float(sol[0][x_sym])
-                        # pyrefly: ignore  # index-error, bad-argument-type
-                        sy = float(sol[0][y_sym])
-                        dot = Dot(ax.c2p(sx, sy), color=YELLOW)
+                    point = _intersect(lines[0][3], lines[1][3])
+                    if point is not None:
+                        dot = Dot(ax.c2p(*point), color=YELLOW)
                         self.play(Create(dot))
                 except Exception:
                     pass
@@ -326,76 +533,44 @@ def _create_working_linear_system(equations: List[str], domain: List[float], ani
             self.wait(2)
     
     # Configure and render
-    config.quality = "medium_quality"
-    config.output_file = f"linear_system_{len(equations)}_eqs_{animation_id}"
-    
-    scene = WorkingLinearSystemScene()
-    scene.render()
-    
-    # Find the actual output file
-    output_dir = Path("media/videos/720p30")
-    output_files = list(output_dir.glob(f"linear_system_{len(equations)}_eqs_{animation_id}*"))
-    
-    if output_files:
-        return True, animation_id, str(output_files[0])
-    else:
-        return False, animation_id, "Output file not found"
+    return _render(WorkingLinearSystemScene, f"linear_system_{len(equations)}_eqs_{animation_id}", animation_id, quality)
 
-def _create_working_integral(function: str, domain: List[float], options: Dict[str, Any], animation_id: str) -> tuple[bool, str, str]:
+def _create_working_integral(function: str, domain: List[float], options: Dict[str, Any], animation_id: str, quality: str = "medium_quality") -> tuple[bool, str, str]:
     """Create working integral (area under curve) animation"""
 
     class WorkingIntegralScene(Scene):
         def construct(self):
-            # Parse function
-            parser = FunctionParser()
-            success, parsed_func, func_type, latex_expr = parser.parse_function(function)
+            # Parse and build function
+            success, parsed_func, expr, func, latex_expr = _get_lambdified(function)
             if not success:
-                error_text = Text(f"Error: {parsed_func}", font_size=24, color=RED)
+                error_text = _text(f"Error: {parsed_func}", font_size=24, color=RED)
                 self.add(error_text)
                 self.wait(2)
                 return
 
-            # Build function
-            x = sp.Symbol('x')
-            expr = sp.sympify(parsed_func)
-            func = sp.lambdify(x, expr, modules=['numpy', 'math'])
-
             # Estimate y-range
             x_vals = np.linspace(domain[0], domain[1], 200)
-            y_vals: List[float] = []
-            for xv in x_vals:
-                try:
-                    yv = func(xv)
-                    if not (np.isnan(yv) or np.isinf(yv)):
-                        y_vals.append(float(yv))
-                except Exception:
-                    pass
-            if not y_vals:
-                y_vals = [-1.0, 1.0]
-            y_min, y_max = min(y_vals), max(y_vals)
+            y_vals = _finite_samples(func, x_vals)
+            y_min, y_max = (float(y_vals.min()), float(y_vals.max())) if y_vals.size else (-1.0, 1.0)
             pad = 0.2 * max(1e-6, (y_max - y_min))
             y_range = [y_min - pad, y_max + pad, max(0.1, (y_max - y_min) / 10.0)]
 
             # Axes
-            ax = Axes(
-                x_range=[domain[0], domain[1], (domain[1] - domain[0]) / 10],
-                y_range=y_range,
-                axis_config={'include_tip': True},
-            )
+            ax = _axes_for(domain, y_range)
 
             # Plot curve and area
-            curve = ax.plot(lambda xv: func(xv), color=BLUE, stroke_width=3)
+            curve = _curve_for(function, domain, y_range)
             # pyrefly: ignore  # bad-argument-type
             area = ax.get_area(curve, x_range=domain, color=GREEN, opacity=0.5)
 
             # Compute definite integral
             try:
-                integral_val = sp.integrate(expr, (x, domain[0], domain[1])).evalf()
-                info_text = Text(f"∫_{domain[0]}^{domain[1]} f(x) dx ≈ {float(integral_val):.4f}", font_size=18, color=YELLOW)
+                integral_val = _definite_integral(_get_scalar_lambdified(function)[0], expr, domain)
+                info_text = _text(f"∫_{domain[0]}^{domain[1]} f(x) dx ≈ {float(integral_val):.4f}", font_size=18, color=YELLOW)
             except Exception:
-                info_text = Text(f"Area under f(x) on [{domain[0]}, {domain[1]}]", font_size=18, color=YELLOW)
+                info_text = _text(f"Area under f(x) on [{domain[0]}, {domain[1]}]", font_size=18, color=YELLOW)
 
-            title = Text(f"Integral of f(x) = {function}", font_size=24, color=WHITE).to_edge(UP)
+            title = _text(f"Integral of f(x) = {function}", font_size=24, color=WHITE).to_edge(UP)
             info_text.next_to(title, DOWN)
 
             # Animate
@@ -407,33 +582,24 @@ def _create_working_integral(function: str, domain: List[float], options: Dict[s
             self.wait(2)
 
     # Render
-    config.quality = "medium_quality"
     safe_function = function.replace('^', '_pow_').replace('/', '_').replace(' ', ' ')
-    config.output_file = f"integral_{safe_function}_{animation_id}"
-    scene = WorkingIntegralScene()
-    scene.render()
-    output_dir = Path("media/videos/720p30")
-    output_files = list(output_dir.glob(f"integral_{safe_function}_{animation_id}*"))
-    if output_files:
-        return True, animation_id, str(output_files[0])
-    return False, animation_id, "Output file not found"
+    return _render(WorkingIntegralScene, f"integral_{safe_function}_{animation_id}", animation_id, quality)
 
-def _create_working_equation_display(equations: List[str], animation_id: str) -> tuple[bool, str, str]:
+def _create_working_equation_display(equations: List[str], animation_id: str, quality: str = "medium_quality") -> tuple[bool, str, str]:
     """Display one or more equations using LaTeX (MathTex) with simple animations."""
 
     class WorkingEquationScene(Scene):
         def construct(self):
-            title = Text("Equations", font_size=24, color=WHITE).to_edge(UP)
+            title = _text("Equations", font_size=24, color=WHITE).to_edge(UP)
             self.play(Write(title))
 
             items: List[Mobject] = []
             for eq in equations:
                 try:
-                    # Allow raw LaTeX or simple strings; wrap if needed
-                    tex = MathTex(eq) if any(ch in eq for ch in ['\\', '^', '_', '{', '}', '=', '+', '-', '*']) else MathTex(eq)
-                    items.append(tex)
+                    # Allow raw LaTeX or simple strings; copy since the layout below moves it
+                    items.append(_math_tex(eq).copy())
                 except Exception:
-                    items.append(Text(eq, font_size=24))
+                    items.append(_text(eq, font_size=24))
 
             # pyrefly: ignore  # bad-argument-type
             group = VGroup(*items).arrange(DOWN, center=False, aligned_edge=LEFT, buff=0.5)
@@ -447,15 +613,7 @@ def _create_working_equation_display(equations: List[str], animation_id: str) ->
 
             self.wait(1.5)
 
-    config.quality = "medium_quality"
-    config.output_file = f"equation_display_{animation_id}"
-    scene = WorkingEquationScene()
-    scene.render()
-    output_dir = Path("media/videos/720p30")
-    output_files = list(output_dir.glob(f"equation_display_{animation_id}*"))
-    if output_files:
-        return True, animation_id, str(output_files[0])
-    return False, animation_id, "Output file not found"
+    return _render(WorkingEquationScene, f"equation_display_{animation_id}", animation_id, quality)
 
 def test_working_json_animator():
     """Test the working JSON animator"""
@@ -474,7 +632,7 @@ def test_working_json_animator():
     
     print("\n1️⃣ Creating Riemann Sum from JSON...")
     print(f"   Input: {json.dumps(riemann_json, indent=2)}")
-    success, anim_id, file_path = create_working_animation_from_json(riemann_json)
+    success, anim_id, file_path = create_working_animation_from_json(riemann_json, quality="low_quality")
     if success:
         print(f"   ✅ Created: {file_path}")
     else:
@@ -492,7 +650,7 @@ def test_working_json_animator():
     
     print("\n2️⃣ Creating Derivative from JSON...")
     print(f"   Input: {json.dumps(derivative_json, indent=2)}")
-    success, anim_id, file_path = create_working_animation_from_json(derivative_json)
+    success, anim_id, file_path = create_working_animation_from_json(derivative_json, quality="low_quality")
     if success:
         print(f"   ✅ Created: {file_path}")
     else:
@@ -1,14 +1,16 @@
 import os
 import time
+import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import Response
-import pyautogui
+import mss
 import cv2
 import numpy as np
-from PIL import Image
 import uvicorn
-from typing import Optional
+from typing import Literal, Optional
 
 app = FastAPI(title="Scrcpy Screenshot Server")
 
@@ -18,31 +20,56 @@ logger = logging.getLogger(__name__)
 
 # Constants
 WINDOW_TITLE = "SM-X610"
+JPEG_QUALITY = int(os.getenv("SCREENSHOT_JPEG_QUALITY", "85"))
+
+# Capture/encode runs off the event loop; mss handles are per-thread
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("SCREENSHOT_WORKERS", "4")))
+_local = threading.local()
+
+def _grabber():
+    """Return this thread's mss instance, creating it on first use."""
+    sct = getattr(_local, "sct", None)
+    if sct is None:
+        sct = _local.sct = mss.mss()
+    return sct
+
+def _capture_encode(fmt: str = "jpeg") -> tuple[bytes, int, int]:
+    """Grab the primary monitor; return (payload, width, height) as JPEG or raw BGR."""
+    sct = _grabber()
+    # monitors[0] is the virtual screen spanning every display; [1] is the
+    # primary one, which is what pyautogui captured
+    raw = sct.grab(sct.monitors[1])
+
+    # Verify the screenshot is not empty
+    if raw.width == 0 or raw.height == 0:
+        raise Exception("Screenshot capture resulted in an empty image")
+
+    # BGRA view over the grab buffer; drop alpha without converting colour order
+    frame = np.frombuffer(raw.bgra, dtype=np.uint8).reshape(raw.height, raw.width, 4)[:, :, :3]
+
+    if fmt == "raw":
+        # No encoding at all; for clients on the same host/LAN
+        return frame.tobytes(), raw.width, raw.height
+
+    # Encode as JPEG (libjpeg-turbo inside OpenCV)
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    return buffer.tobytes(), raw.width, raw.height
 
 @app.get("/screenshot")
-async def get_screenshot():
+async def get_screenshot(format: Literal["jpeg", "raw"] = "jpeg"):
     """
-    Capture a screenshot of the scrcpy window and return it as a PNG.
+    Capture a screenshot of the scrcpy window and return it as a JPEG, or as
+    raw BGR bytes (format=raw) sized by the X-Width/X-Height headers.
     """
     try:
-        # Take screenshot of the entire screen
-        screenshot = pyautogui.screenshot()
-        
-        # Verify the screenshot is not empty
-        if not screenshot or screenshot.size[0] == 0 or screenshot.size[1] == 0:
-            raise Exception("Screenshot capture resulted in an empty image")
-    
-        # Convert to OpenCV format
-        frame = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-        
-        # Encode as PNG
-        _, buffer = cv2.imencode('.png', frame)
+        loop = asyncio.get_running_loop()
+        content, width, height = await loop.run_in_executor(_POOL, _capture_encode, format)
         
         # Return the image as a response
         return Response(
-            content=buffer.tobytes(),
-            media_type="image/png",
-            headers={"Cache-Control": "no-cache"}
+            content=content,
+            media_type="image/jpeg" if format == "jpeg" else "application/octet-stream",
+            headers={"Cache-Control": "no-cache", "X-Width": str(width), "X-Height": str(height)}
         )
         
     except Exception as e:
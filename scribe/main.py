@@ -2,21 +2,23 @@
 
 import argparse
 import os
+import sys
 import numpy as np
 import speech_recognition as sr
 import whisper
 import torch
 import asyncio
 import websockets
-import json
+import orjson
 import subprocess
+import threading
 import psutil
 from websockets.server import WebSocketServerProtocol
 from typing import Set, Optional
 
-from datetime import datetime, timedelta
-from queue import Queue
-from time import sleep
+from datetime import datetime, timedelta, timezone
+from queue import Empty, Queue
+from time import monotonic
 from sys import platform
 
 
@@ -28,6 +30,9 @@ def main():
                         choices=["tiny", "base", "small", "medium", "large"])
     parser.add_argument("--non_english", action='store_true',
                         help="Don't use the english model.")
+    parser.add_argument("--backend", default="openai", choices=["openai", "faster"],
+                        help="Whisper implementation: reference openai-whisper, or "
+                             "faster-whisper (CTranslate2, fp16 on GPU / int8 on CPU).")
     parser.add_argument("--energy_threshold", default=1000,
                         help="Energy level for mic to detect.", type=int)
     parser.add_argument("--record_timeout", default=4,
@@ -92,7 +97,54 @@ def main():
     model = args.model
     if args.model != "large" and not args.non_english:
         model = model + ".en"
-    audio_model = whisper.load_model(model, device="cuda" if cuda else "cpu")
+    if args.backend == "faster":
+        from faster_whisper import WhisperModel
+        audio_model = WhisperModel(model, device="cuda" if cuda else "cpu",
+                                   compute_type="float16" if cuda else "int8")
+    else:
+        audio_model = whisper.load_model(model, device="cuda" if cuda else "cpu")
+
+    # Reused page-locked staging buffer for int16 PCM on its way to the GPU
+    pinned_pcm: Optional[torch.Tensor] = None
+
+    # Reused float32 scratch for CPU-side conversion, sized for a few record
+    # windows and grown if a backlog ever exceeds that. Only the transcription
+    # thread touches it, and each transcribe() finishes before the next
+    # conversion, so no model holds on to a previous phrase's view.
+    float_scratch = np.empty(int(16000 * args.record_timeout * 4), dtype=np.float32)
+
+    def to_float32(pcm: np.ndarray) -> np.ndarray:
+        """int16 PCM -> float32 in [-1, 1) in a single ufunc pass, into the scratch buffer"""
+        nonlocal float_scratch
+        if float_scratch.size < pcm.size:
+            float_scratch = np.empty(pcm.size, dtype=np.float32)
+        out = float_scratch[:pcm.size]
+        np.multiply(pcm, np.float32(1.0 / 32768.0), out=out)
+        return out
+
+    def to_cuda(pcm: np.ndarray) -> torch.Tensor:
+        """
+        Ship int16 PCM (half the bytes of float32) through a pinned buffer and
+        convert on the device. The buffer is only rewritten after the previous
+        phrase's transcription has synchronized.
+        """
+        nonlocal pinned_pcm
+        if pinned_pcm is None or pinned_pcm.numel() < pcm.size:
+            pinned_pcm = torch.empty(max(pcm.size, 16000 * 30), dtype=torch.int16, pin_memory=True)
+        staged = pinned_pcm[:pcm.size]
+        staged.copy_(torch.from_numpy(pcm))
+        return staged.to("cuda", non_blocking=True).float().mul_(1.0 / 32768.0)
+
+    def transcribe(pcm: np.ndarray) -> str:
+        """Transcribe mono 16kHz int16 PCM with the selected backend"""
+        if args.backend == "faster":
+            segments, _ = audio_model.transcribe(to_float32(pcm), language=None if args.non_english else "en",
+                                                 beam_size=1, vad_filter=False)
+            return ''.join(seg.text for seg in segments).strip()
+        # On GPU, hand whisper a device tensor so the STFT/log-mel front end runs there too
+        audio = to_cuda(pcm) if cuda else to_float32(pcm)
+        result = audio_model.transcribe(audio, fp16=cuda)
+        return result['text'].strip()
 
     record_timeout = args.record_timeout
     phrase_timeout = args.phrase_timeout
@@ -104,8 +156,18 @@ def main():
     websocket_server = None
     
     # ffplay process management
+    # Walking the process table costs a /proc read per process, and this runs on
+    # every phrase; rescan at most every FFPLAY_RESCAN_SECONDS
+    FFPLAY_RESCAN_SECONDS = 2.0
+    last_ffplay_scan = 0.0
+    
     def kill_ffplay_processes():
         """Kill all running ffplay processes"""
+        nonlocal last_ffplay_scan
+        now = monotonic()
+        if now - last_ffplay_scan < FFPLAY_RESCAN_SECONDS:
+            return
+        last_ffplay_scan = now
         print("Killing ffplay processes...")
         try:
             killed_count = 0
@@ -135,39 +197,51 @@ def main():
     async def broadcast_transcription(text: str):
         """Broadcast transcription to all connected clients"""
         if connected_clients:
-            message = json.dumps({
+            # Serialized once for every client; decoded so it still goes out as a
+            # text frame, which the browser client JSON.parses
+            message = orjson.dumps({
                 "type": "transcription",
                 "text": text,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-            # Create a copy of the set to avoid modification during iteration
-            clients_to_remove = set()
-            for client in connected_clients.copy():
+                "timestamp": datetime.now(timezone.utc)
+            }).decode()
+            
+            async def safe_send(client: WebSocketServerProtocol):
                 try:
-                    await client.send(message)
+                    await asyncio.wait_for(client.send(message), 2.0)
+                    return client, True
                 except websockets.exceptions.ConnectionClosed:
-                    clients_to_remove.add(client)
+                    return client, False
                 except Exception as e:
                     print(f"Error sending to client: {e}")
-                    clients_to_remove.add(client)
+                    return client, False
+            
+            # Send to everyone at once so one slow client can't stall the rest
+            results = await asyncio.gather(*(safe_send(c) for c in list(connected_clients)))
             
             # Remove disconnected clients
-            connected_clients.difference_update(clients_to_remove)
+            connected_clients.difference_update(client for client, ok in results if not ok)
     
     # Start WebSocket server if enabled
     if args.enable_websocket:
         try:
+            # uvloop's event loop is markedly faster on send-heavy workloads
+            try:
+                import uvloop
+                asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            except ImportError:
+                pass
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             
             websocket_server = websockets.serve(
                 handle_client, 
                 args.websocket_host, 
-                args.websocket_port
+                args.websocket_port,
+                # Transcription messages are tiny; permessage-deflate only adds latency
+                compression=None
             )
             
             # Start the server in a separate thread
-            import threading
             def run_websocket_server():
                 loop.run_until_complete(websocket_server)
                 loop.run_forever()
@@ -196,68 +270,97 @@ def main():
     # We could do this manually but SpeechRecognizer provides a nice helper.
     recorder.listen_in_background(source, record_callback, phrase_time_limit=record_timeout)
 
+    # Transcription runs on its own thread, fed by the main loop in arrival order.
+    # It owns `transcription` and the console/WebSocket output.
+    transcribe_q: "Queue[tuple[bool, np.ndarray]]" = Queue(maxsize=8)
+
+    def handle_transcription(phrase_complete, pcm):
+        # Read the transcription.
+        text = transcribe(pcm)
+
+        # If we detected a pause between recordings, add a new item to our transcription.
+        # Otherwise edit the existing one.
+        if phrase_complete:
+            transcription.append(text)
+            # Broadcast to WebSocket clients only when phrase is complete AND has meaningful content
+            # Filter out very short phrases that are likely incomplete
+            if (args.enable_websocket and text.strip() and connected_clients):
+                try:
+                    # Run the async broadcast in the event loop
+                    asyncio.run_coroutine_threadsafe(
+                        broadcast_transcription(text), 
+                        loop
+                    )
+                except Exception as e:
+                    print(f"WebSocket broadcast error: {e}")
+            
+            # Only display complete phrases to console
+            os.system('cls' if os.name=='nt' else 'clear')
+            for line in transcription:
+                if line.strip():  # Only show non-empty lines
+                    print(line)
+            print('', end='', flush=True)
+        else:
+            transcription[-1] = text
+            # Don't display partial transcriptions to console
+
+    def transcription_worker():
+        while True:
+            phrase_complete, pcm = transcribe_q.get()
+            try:
+                handle_transcription(phrase_complete, pcm)
+            except Exception as e:
+                # Keep draining the queue; a dead worker would block the audio loop on put()
+                print(f"Transcription error: {e}", file=sys.stderr, flush=True)
+
+    threading.Thread(target=transcription_worker, daemon=True).start()
+
     # Cue the user that we're ready to go.
     print("Model loaded.\n")
     print("Listening... (Press Ctrl+C to stop)")
 
     while True:
         try:
-            now = datetime.utcnow()
-            # Pull raw recorded audio from the queue.
-            if not data_queue.empty():
-                # Kill ffplay when speech is detected
-                if args.kill_ffplay:
-                    kill_ffplay_processes()
-                
-                phrase_complete = False
-                # If enough time has passed between recordings, consider the phrase complete.
-                # Clear the current working audio buffer to start over with the new data.
-                if phrase_time and now - phrase_time > timedelta(seconds=phrase_timeout):
-                    phrase_complete = True
-                # This is the last time we received new audio data from the queue.
-                phrase_time = now
-                
-                # Combine audio data from queue
-                audio_data = b''.join(data_queue.queue)
-                data_queue.queue.clear()
-                
-                # Convert in-ram buffer to something the model can use directly without needing a temp file.
-                # Convert data from 16 bit wide integers to floating point with a width of 32 bits.
-                # Clamp the audio stream frequency to a PCM wavelength compatible default of 32768hz max.
-                audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
+            # Block until the recorder thread delivers audio; wakes the instant a
+            # chunk is queued instead of on the next poll tick
+            try:
+                first = data_queue.get(timeout=0.25)
+            except Empty:
+                continue
+            now = datetime.now(timezone.utc)
 
-                # Read the transcription.
-                result = audio_model.transcribe(audio_np, fp16=torch.cuda.is_available())
-                text = result['text'].strip()
+            # Kill ffplay when speech is detected
+            if args.kill_ffplay:
+                kill_ffplay_processes()
+            
+            phrase_complete = False
+            # If enough time has passed between recordings, consider the phrase complete.
+            # Clear the current working audio buffer to start over with the new data.
+            if phrase_time and now - phrase_time > timedelta(seconds=phrase_timeout):
+                phrase_complete = True
+            # This is the last time we received new audio data from the queue.
+            phrase_time = now
+            
+            # Combine with anything else already queued. Drain through get_nowait so the
+            # queue's lock is honoured; reading .queue and then clearing it
+            # could drop chunks the recorder thread put in between
+            chunks = [first]
+            try:
+                while True:
+                    chunks.append(data_queue.get_nowait())
+            except Empty:
+                pass
+            # Writable, so torch.from_numpy can wrap it without copying
+            audio_data = bytearray().join(chunks)
+            
+            # Convert in-ram buffer to something the model can use directly without needing a temp file.
+            # The 16 bit wide integers are scaled to 32 bit floats inside transcribe(), where the
+            # backend decides whether that happens on the CPU or on the GPU.
+            pcm = np.frombuffer(audio_data, dtype=np.int16)
 
-                # If we detected a pause between recordings, add a new item to our transcription.
-                # Otherwise edit the existing one.
-                if phrase_complete:
-                    transcription.append(text)
-                    # Broadcast to WebSocket clients only when phrase is complete AND has meaningful content
-                    # Filter out very short phrases that are likely incomplete
-                    if (args.enable_websocket and text.strip() and connected_clients):
-                        try:
-                            # Run the async broadcast in the event loop
-                            asyncio.run_coroutine_threadsafe(
-                                broadcast_transcription(text), 
-                                loop
-                            )
-                        except Exception as e:
-                            print(f"WebSocket broadcast error: {e}")
-                    
-                    # Only display complete phrases to console
-                    os.system('cls' if os.name=='nt' else 'clear')
-                    for line in transcription:
-                        if line.strip():  # Only show non-empty lines
-                            print(line)
-                    print('', end='', flush=True)
-                else:
-                    transcription[-1] = text
-                    # Don't display partial transcriptions to console
-            else:
-                # Infinite loops are bad for processors, must sleep.
-                sleep(0.25)
+            # Hand off to the transcription thread; this loop goes straight back
+            # to collecting audio, so phrase timing isn't skewed by model time
+            transcribe_q.put((phrase_complete, pcm))
         except KeyboardInterrupt:
             break
 
@@ -2,19 +2,33 @@ from vision.util.transformationkit.imagereworkengine import grab_camera_thread_c
 from vision.util.transformationkit.imagereworkengine import kill_camera_thread
 from vision.util.transformationkit.imagereworkengine import init_camera_thread
 from vision.util.transformationkit.imagereworkengine import aruco_marker_capture, position_correction_capture
+from vision.util.transformationkit.imagereworkengine import cached_camera_capture, cached_aruco_capture
 from vision.util.rlib.request import FiducialRequest, ImageRequest, CorrectionRequest
 from typing import Union
 import base64
 import numpy as np
 import cv2
+import asyncio
 import hashlib
+import struct
+from concurrent.futures import ThreadPoolExecutor
 
 from util import markergen
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, File, UploadFile, Query
+from fastapi.concurrency import run_in_threadpool
 
 app = FastAPI()
 
+# Page correction is CPU-bound (warp + binarisation); OpenCV drops the GIL, but
+# more than a couple at once just fight the capture and detection threads
+CORRECTION_WORKERS = 2
+_POOL = ThreadPoolExecutor(max_workers=CORRECTION_WORKERS)
+
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+# PNG colour type -> channels stored per pixel
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
 
 @app.get("/")
 def read_root():
@@ -32,53 +46,72 @@ def gen_marker(request: FiducialRequest):
     return markergen.marker_gen(request.position)
 
 
+def _png_info(image_bytes: bytes, validate: bool = False) -> dict:
+    """
+    Describe a PNG payload from its IHDR header; raises HTTPException(400) if it
+    isn't one. The full decode only runs when validate is set.
+    """
+    # Check it's a PNG from the signature instead of re-encoding the image
+    if not image_bytes.startswith(PNG_MAGIC):
+        # Not a PNG. Send back a hash of the file for verification.
+        hash = hashlib.sha256(image_bytes).hexdigest()
+        raise HTTPException(status_code=400, detail="Invalid image data. But we've got a sha256 hash, so you can check that the image arrived properly.Said hash: " + hash)
+    
+    # IHDR is always the first chunk: width, height, bit depth, colour type
+    if len(image_bytes) < 33 or image_bytes[12:16] != b"IHDR":
+        raise HTTPException(status_code=400, detail="Invalid image data")
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", image_bytes[16:26])
+    if color_type not in PNG_CHANNELS:
+        raise HTTPException(status_code=400, detail="Invalid image data")
+    channels = PNG_CHANNELS[color_type]
+    dtype = "uint16" if bit_depth == 16 else "uint8"
+    
+    if validate:
+        # Decode image using OpenCV to prove the pixel data is intact
+        image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_UNCHANGED)
+        
+        if image is None:
+            raise HTTPException(status_code=400, detail="Invalid image data")
+    
+    return {
+        "message": "PNG image received successfully",
+        "image_info": {
+            "width": width,
+            "height": height,
+            "channels": channels,
+            "dtype": dtype,
+            "size_bytes": len(image_bytes)
+        }
+    }
+
+
 @app.post("/upload-image")
-def upload_image(request: ImageRequest):
+def upload_image(request: ImageRequest, validate: bool = False):
     try:
         # Remove data URL prefix if present (e.g., "data:image/png;base64,")
         image_data = request.image_data
         if image_data.startswith('data:image'):
-            image_data = image_data.split(',')[1]
+            image_data = image_data.partition(',')[2]
         
         # Decode base64 string
         image_bytes = base64.b64decode(image_data)
         
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        
-        # Decode image using OpenCV
-        image = cv2.imdecode(nparr, cv2.IMREAD_UNCHANGED)
-        
-        if image is None:
-            raise HTTPException(status_code=400, detail="Invalid image data")
-        
-        # Check if it's a PNG by trying to encode it back to PNG
-        success, encoded_img = cv2.imencode('.png', image)
-        if not success:
-            # If encoding fails, it's not a valid PNG. Send back a hash of the file for verification.
-            hash = hashlib.sha256(image_bytes).hexdigest()
-            raise HTTPException(status_code=400, detail="Invalid image data. But we've got a sha256 hash, so you can check that the image arrived properly.Said hash: " + hash)
-        
-        # Get image info
-        height, width = image.shape[:2]
-        channels = image.shape[2] if len(image.shape) == 3 else 1
-        
-        return {
-            "message": "PNG image received successfully",
-            "image_info": {
-                "width": width,
-                "height": height,
-                "channels": channels,
-                "dtype": str(image.dtype),
-                "size_bytes": len(image_bytes)
-            }
-        }
+        return _png_info(image_bytes, validate)
         
     except base64.binascii.Error:
         raise HTTPException(status_code=400, detail="Invalid base64 encoding")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
 
+
+@app.post("/upload-image-raw")
+def upload_image_raw(file: UploadFile = File(...), validate: bool = False):
+    """Same as /upload-image, but the PNG arrives as multipart bytes: no base64 inflation or decode"""
+    try:
+        return _png_info(file.file.read(), validate)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
+
 @app.get("/start-image-engine")
 def start_image_engine(background_tasks: BackgroundTasks):
     background_tasks.add_task(init_camera_thread)
@@ -89,14 +122,24 @@ def kill_image_engine(background_tasks: BackgroundTasks):
     background_tasks.add_task(kill_camera_thread)
     return "True"
 
+# Steady state is a lookup of bytes the camera threads already encoded, served on
+# the event loop; only a cold start falls back to the threadpool
 @app.get("/current-frame")
-def get_current_frame():
-    return grab_camera_thread_capture()
+async def get_current_frame():
+    response = cached_camera_capture()
+    if response is None:
+        response = await run_in_threadpool(grab_camera_thread_capture)
+    return response
 
 @app.get("/current-frame-aruco")
-def get_aruco_frame():
-    return aruco_marker_capture()
+async def get_aruco_frame():
+    response = cached_aruco_capture()
+    if response is None:
+        response = await run_in_threadpool(aruco_marker_capture)
+    return response
 
 @app.get("/current-frame-correction")
-def get_corrected_frame():
-    return position_correction_capture(120)
\ No newline at end of file
+async def get_corrected_frame(scale: int = Query(1, ge=1, le=2)):
+    # 1280px output by default; scale=2 for the old 2560px page
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_POOL, position_correction_capture, 120, scale)
\ No newline at end of file
@@ -1,8 +1,13 @@
 from numpy.random.mtrand import randint
 from base64 import b64encode
 import cv2
+import numpy as np
+from fastapi import HTTPException
 from fastapi.responses import Response
 import random
+import logging
+
+logger = logging.getLogger(__name__)
 
 mapping = {
     "LU": 1,
@@ -11,22 +16,34 @@ mapping = {
     "RD": 4
 }
 
-def marker_gen(pos:str) -> str:
-    return Response(content=marker_gen_internal(pos).tobytes(), media_type="image/png")
+def marker_gen(pos:str) -> Response:
+    if pos not in mapping:
+        raise HTTPException(status_code=400, detail=f"Unknown marker position: {pos}")
+    if pos not in _MARKERS:
+        raise HTTPException(status_code=500, detail="Misc failure")
+    return Response(content=_MARKERS[pos], media_type="image/png")
 
-def marker_gen_internal(pos: str) -> str:
+def marker_gen_internal(pos: str) -> np.ndarray:
+    """Encoded PNG buffer for the marker at pos; raises RuntimeError if it can't be made"""
     try:
         # cv::aruco::Dictionary dictionary = cv::aruco::getPredefinedDictionary(cv::aruco::DICT_6X6_250);
         img: cv2.mat = None
         dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_250)
         img = cv2.aruco.generateImageMarker(dict, mapping[pos], 200, img,)
-        stat, buffer = cv2.imencode(".png", img)
-        #if not stat:
-        #    return "Failed to encode image. Try again :see_no_evil:"
         img = cv2.copyMakeBorder(img, 100, 100, 100, 100, cv2.BORDER_CONSTANT, value=[255, 255, 255])
         _, buffer = cv2.imencode('.png', img)
 
         return buffer
         #return "worky"
-    except:
-        return "Misc failure"
\ No newline at end of file
+    except Exception as e:
+        raise RuntimeError("Misc failure") from e
+
+# Only four positions exist, so every marker PNG is generated once at import. A
+# failure (e.g. OpenCV without aruco) leaves that position out rather than
+# stopping the app from importing; marker_gen answers 500 for it
+_MARKERS = {}
+for _pos in mapping:
+    try:
+        _MARKERS[_pos] = marker_gen_internal(_pos).tobytes()
+    except RuntimeError:
+        logger.exception("Marker %s unavailable", _pos)
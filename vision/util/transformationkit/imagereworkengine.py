@@ -3,34 +3,163 @@ import numpy as np
 import cv2 as cv
 import threading
 from threading import Thread
+from time import monotonic
 from fastapi.responses import Response
 
-from vision.util.autobrightness import automatic_brightness_and_contrast
 from . import softbinary as sb
 
+# Built once; detectMarkers doesn't mutate the detector, so requests share it
+_ARUCO_DICT = cv.aruco.getPredefinedDictionary(cv.aruco.DICT_6X6_250)
+_ARUCO_PARAMS = cv.aruco.DetectorParameters()
+# One adaptive-threshold pass, sized for the page-corner markers on the
+# half-size detection frame, and ignore contours too small to be one of them
+_ARUCO_PARAMS.adaptiveThreshWinSizeMin = 13
+_ARUCO_PARAMS.adaptiveThreshWinSizeMax = 13
+_ARUCO_PARAMS.adaptiveThreshWinSizeStep = 10
+_ARUCO_PARAMS.minMarkerPerimeterRate = 0.05
+_ARUCO_PARAMS.polygonalApproxAccuracyRate = 0.05
+# Sub-pixel corners tighten the perspective correction; a few iterations are
+# plenty at this accuracy
+_ARUCO_PARAMS.cornerRefinementMethod = cv.aruco.CORNER_REFINE_SUBPIX
+_ARUCO_PARAMS.cornerRefinementMaxIterations = 15
+_ARUCO_PARAMS.cornerRefinementMinAccuracy = 0.1
+_DETECTOR = cv.aruco.ArucoDetector(_ARUCO_DICT, _ARUCO_PARAMS)
+
+# Markers are found on a downscaled frame (thresholding and contour search are
+# O(pixels)) and their corners scaled back up, then refined again on the
+# full-resolution gray frame so the correction keeps sub-pixel accuracy
+DETECTION_SCALE = 0.5
+_SUBPIX_WINDOW = (5, 5)
+_SUBPIX_CRITERIA = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 15, 0.1)
+
+# Previews are lossy; JPEG encodes several times faster than PNG's zlib pass.
+# The corrected page gets a higher quality so the binarised text stays crisp
+PREVIEW_JPEG_QUALITY = 75
+CORRECTION_JPEG_QUALITY = 85
+
+def _jpeg_params(quality: int) -> list[int]:
+    # Baseline JPEG with the default Huffman tables skips libjpeg's extra passes
+    return [
+        int(cv.IMWRITE_JPEG_QUALITY), quality,
+        int(cv.IMWRITE_JPEG_OPTIMIZE), 0,
+        int(cv.IMWRITE_JPEG_PROGRESSIVE), 0,
+    ]
+
+_PREVIEW_JPEG_PARAMS = _jpeg_params(PREVIEW_JPEG_QUALITY)
+_CORRECTION_JPEG_PARAMS = _jpeg_params(CORRECTION_JPEG_QUALITY)
+
+def _jpeg(img, params: list[int] = _PREVIEW_JPEG_PARAMS) -> memoryview:
+    _, buffer = cv.imencode('.jpg', img, params)
+    # Response bodies may be memoryviews; this skips copying into a bytes object
+    return memoryview(buffer.reshape(-1))
+
+def _encode(img, params: list[int] = _PREVIEW_JPEG_PARAMS) -> Response:
+    return Response(content=_jpeg(img, params), media_type="image/jpeg")
+
+def _annotate(frame, marker_corners, marker_ids):
+    # Published frames are shared and read-only, so draw on a copy
+    outImage: cv.Mat = frame.copy()
+    cv.aruco.drawDetectedMarkers(outImage, marker_corners, marker_ids)
+    return outImage
+
+# MJPG frames can be decoded by the GPU's JPEG engine (nvJPEG via torchvision)
+# on CUDA hosts; elsewhere OpenCV decodes them on the CPU as usual
+try:
+    import torch
+    from torchvision.io import decode_jpeg
+    _GPU_JPEG = torch.cuda.is_available()
+except ImportError:
+    _GPU_JPEG = False
+
+def _decode_mjpg(raw: np.ndarray) -> np.ndarray | None:
+    """BGR frame from a raw MJPG buffer (1 x N bytes), decoded on the GPU"""
+    if raw.shape[1] < 2 or raw[0, 0] != 0xFF or raw[0, 1] != 0xD8:
+        # No JPEG SOI marker; not something nvJPEG or imdecode can read
+        return None
+    try:
+        rgb = decode_jpeg(torch.from_numpy(raw.reshape(-1)), device="cuda")
+    except RuntimeError:
+        # Some webcams send MJPG without Huffman tables, which nvJPEG rejects
+        return cv.imdecode(raw, cv.IMREAD_COLOR)
+    return rgb.flip(0).permute(1, 2, 0).contiguous().cpu().numpy()
+
+# Background detection/encoding keeps running this long after the last request for it
+DETECTION_IDLE_SECONDS = 5.0
+
 class cameraImageWorker(Thread):
     def __init__(self):
         super().__init__()  # Call the parent class's constructor
         self.should_stop = threading.Event()
         self.cap = None
+        # Latest frame from the capture loop; endpoints read this instead of cap
+        self._lock = threading.Lock()
+        self.latest: np.ndarray | None = None
+        # Frames are only decoded while someone has asked for one recently
+        self._snapshot_wanted_until = 0.0
+        # ArUco results for a recent frame, computed off the request path while
+        # the next frame is being captured: (frame, gray, corners, ids)
+        self._frame_seq = 0
+        self._new_frame = threading.Condition(self._lock)
+        self._detected = threading.Condition(self._lock)
+        self.detection: tuple | None = None
+        self._wanted_until = 0.0
+        # Encoded previews, produced by the worker threads while clients poll so
+        # the request handlers only hand out bytes
+        self._preview_wanted_until = 0.0
+        # Annotated ArUco previews have their own demand: correction polling
+        # keeps detection running but never looks at them
+        self._aruco_preview_wanted_until = 0.0
+        self.latest_jpeg: memoryview | None = None
+        self.aruco_jpeg: memoryview | None = None
 
     def run(self):
         self.cap = cv.VideoCapture(0)
+        # USB webcams only reach 30 FPS at 1080p compressed; raw YUYV tops out ~5
+        self.cap.set(cv.CAP_PROP_FOURCC, cv.VideoWriter_fourcc(*'MJPG'))
+        self.cap.set(cv.CAP_PROP_FPS, 30)
         self.cap.set(cv.CAP_PROP_FRAME_WIDTH, 1920)
         self.cap.set(cv.CAP_PROP_FRAME_HEIGHT, 1080)
+        # Keep the driver queue short so the newest frame isn't stuck behind stale ones
+        self.cap.set(cv.CAP_PROP_BUFFERSIZE, 1)
+        # Only when the driver really took MJPG; raw YUYV isn't a JPEG
+        if _GPU_JPEG and int(self.cap.get(cv.CAP_PROP_FOURCC)) == cv.VideoWriter_fourcc(*'MJPG'):
+            # Hand back the compressed MJPG bytes; _decode_mjpg does the decode
+            self.cap.set(cv.CAP_PROP_CONVERT_RGB, 0)
 
         if not self.cap.isOpened():
             print("Cannot open camera")
             exit()
+        Thread(target=self._detect_loop, daemon=True).start()
         while not self.should_stop.is_set():
-            # Capture frame-by-frame
-            ret, frame = self.cap.read()
+            # Capture frame-by-frame: grab() dequeues, retrieve() decodes
+            ret = self.cap.grab()
+            if ret:
+                now = monotonic()
+                if now >= max(self._wanted_until, self._preview_wanted_until, self._snapshot_wanted_until):
+                    # Nobody is looking; keep draining the driver but skip the decode
+                    continue
+                ret, frame = self.cap.retrieve()
+                if ret and frame.ndim == 2 and frame.shape[0] == 1:
+                    frame = _decode_mjpg(frame)
+                    if frame is None:
+                        # A corrupt frame; drop it rather than the stream
+                        continue
 
             # if frame is read correctly ret is True
             if not ret:
                 print("Can't receive frame (stream end?). Exiting ...")
                 break
 
+            # retrieve() hands back a new array each time, so publishing the
+            # reference is enough. Readers share it: anything that draws must copy
+            frame.flags.writeable = False
+            with self._lock:
+                self.latest = frame
+                self._frame_seq += 1
+                self._new_frame.notify_all()
+            if now < self._preview_wanted_until:
+                self.latest_jpeg = _jpeg(frame)
+
     # When everything done, release the capture
         self.cap.release()
         cv.destroyAllWindows()
@@ -38,12 +167,198 @@ class cameraImageWorker(Thread):
     def stop(self):
         self.should_stop.set()
 
+    def snapshot(self, timeout: float = 2.0) -> np.ndarray | None:
+        """
+        Most recent frame, or None if none arrives in time. Decoding pauses when
+        idle, so after an idle spell wait for a fresh frame.
+        """
+        with self._lock:
+            now = monotonic()
+            idle = now >= max(self._wanted_until, self._preview_wanted_until, self._snapshot_wanted_until)
+            self._snapshot_wanted_until = now + DETECTION_IDLE_SECONDS
+            if idle or self.latest is None:
+                seq = self._frame_seq
+                if not self._new_frame.wait_for(lambda: self._frame_seq != seq, timeout=timeout):
+                    return None
+            return self.latest
+
+    def _detect_loop(self):
+        """Detect markers on each new frame while ArUco results are in demand"""
+        seen = 0
+        while not self.should_stop.is_set():
+            with self._lock:
+                ready = self._new_frame.wait_for(
+                    lambda: self._frame_seq != seen and monotonic() < self._wanted_until,
+                    timeout=0.5,
+                )
+                if not ready:
+                    continue
+                seen, frame = self._frame_seq, self.latest
+            # Detect on one channel at reduced size; the full-res colour frame
+            # is kept for the output image and the warp
+            gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+            small = cv.resize(gray, None, fx=DETECTION_SCALE, fy=DETECTION_SCALE, interpolation=cv.INTER_AREA)
+            marker_corners, marker_ids, _ = _DETECTOR.detectMarkers(small)
+            if marker_corners:
+                # One cornerSubPix call for every marker's four corners
+                pts = np.concatenate(marker_corners).reshape(-1, 1, 2) / DETECTION_SCALE
+                pts = cv.cornerSubPix(gray, pts.astype(np.float32), _SUBPIX_WINDOW, (-1, -1), _SUBPIX_CRITERIA)
+                marker_corners = tuple(pts.reshape(-1, 1, 4, 2))
+            aruco_jpeg = None
+            if monotonic() < self._aruco_preview_wanted_until:
+                aruco_jpeg = _jpeg(_annotate(frame, marker_corners, marker_ids))
+            with self._lock:
+                self.detection = (frame, gray, marker_corners, marker_ids)
+                self.aruco_jpeg = aruco_jpeg
+                self._detected.notify_all()
+
+    def detection_snapshot(self, timeout: float = 2.0) -> tuple | None:
+        """
+        Latest (frame, gray, corners, ids). After an idle spell the stored result is
+        stale, so wait for the first detection on a fresh frame.
+        """
+        with self._lock:
+            now = monotonic()
+            idle = now >= self._wanted_until
+            self._wanted_until = now + DETECTION_IDLE_SECONDS
+            self._new_frame.notify()
+            if idle or self.detection is None:
+                self.detection = None
+                self.aruco_jpeg = None
+                self._detected.wait_for(lambda: self.detection is not None, timeout=timeout)
+            return self.detection
+
+    def preview_jpeg(self) -> memoryview | None:
+        """Encoded latest frame while previews are being polled, else None (and start encoding)"""
+        now = monotonic()
+        polling = now < self._preview_wanted_until
+        self._preview_wanted_until = now + DETECTION_IDLE_SECONDS
+        if not polling:
+            # Whatever was encoded before the idle spell is stale
+            self.latest_jpeg = None
+        return self.latest_jpeg
+
+    def aruco_preview_jpeg(self) -> memoryview | None:
+        """
+        Annotated ArUco JPEG of the latest detection while previews are being
+        polled and detection is running, else None (and start annotating)
+        """
+        with self._lock:
+            now = monotonic()
+            polling = now < self._aruco_preview_wanted_until
+            self._aruco_preview_wanted_until = now + DETECTION_IDLE_SECONDS
+            if not polling or now >= self._wanted_until:
+                return None
+            self._wanted_until = now + DETECTION_IDLE_SECONDS
+            return self.aruco_jpeg
+
+# Perspective correction: markers 1-4 sit at the page corners and the page is
+# warped onto a square of CORRECTION_SIZE * scale_factor
+CORRECTION_SIZE = 1280
+_CORRECTION_UNIT = np.array([
+    [0, 0],
+    [1, 0],
+    [1, 1],
+    [0, 1]
+], dtype=np.float32)
+# Source corner for each destination corner: top-left of marker 1, top-right of
+# 2, bottom-right of 4, bottom-left of 3
+_CORRECTION_IDS = np.array([1, 2, 4, 3])
+_CORRECTION_VERTICES = np.array([0, 1, 2, 3])
+
+def _correction_points(marker_corners, marker_ids) -> np.ndarray | None:
+    """The four page corners as float32 (4, 2), or None unless markers 1-4 were all found"""
+    ids_flat = marker_ids.reshape(-1)
+    if ids_flat.max() < _CORRECTION_IDS.max():
+        return None
+    # Row of each id in the detection; last detection of a repeated id wins, as
+    # when these were collected into a dict
+    id_to_row = np.full(ids_flat.max() + 1, -1, np.intp)
+    id_to_row[ids_flat] = np.arange(ids_flat.size)
+    rows = id_to_row[_CORRECTION_IDS]
+    if (rows < 0).any():
+        return None
+    corners = np.asarray(marker_corners).reshape(-1, 4, 2)
+    return corners[rows, _CORRECTION_VERTICES].astype(np.float32)
+
+# Last (corners, size, M, maps); with the camera and page still, detections only
+# jitter by a fraction of a pixel, so the transform is reused until a corner
+# moves further
+CORRECTION_REUSE_PIXELS = 1.0
+_correction_cache: tuple | None = None
+
+def _remap_tables(M: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Fixed-point cv.remap tables reproducing warpPerspective(M) onto a size x size square"""
+    xs, ys = np.meshgrid(np.arange(size, dtype=np.float32), np.arange(size, dtype=np.float32))
+    grid = np.dstack((xs, ys))
+    src = cv.perspectiveTransform(grid.reshape(-1, 1, 2), np.linalg.inv(M)).reshape(size, size, 2)
+    return cv.convertMaps(src, None, cv.CV_16SC2)
+
+def _correction_matrix(pts1: np.ndarray, size: int) -> tuple[np.ndarray, tuple | None]:
+    """
+    (M, remap tables) for the page corners. Tables are built once M has held
+    for a second frame, and only for the CPU path.
+    """
+    global _correction_cache
+    cached = _correction_cache
+    if cached is not None and cached[1] == size and np.abs(pts1 - cached[0]).max() < CORRECTION_REUSE_PIXELS:
+        _, _, M, maps = cached
+        if maps is None and not _CUDA:
+            maps = _remap_tables(M, size)
+            _correction_cache = (cached[0], size, M, maps)
+        return M, maps
+    M = cv.getPerspectiveTransform(pts1, _CORRECTION_UNIT * (size - 1))
+    _correction_cache = (pts1, size, M, None)
+    return M, None
+
+# The stock opencv-python wheels have no CUDA; custom builds on the GPU box do
+try:
+    _CUDA = cv.cuda.getCudaEnabledDeviceCount() > 0
+except (AttributeError, cv.error):
+    _CUDA = False
+
+CORRECTION_GAMMA = 1.2
+_gpu_gamma = None
+# Per-thread warp/gamma output buffers, reused while the size stays the same;
+# nothing keeps them past the request that filled them
+_scratch = threading.local()
+
+def _correction_buffers(size: int) -> tuple[np.ndarray, np.ndarray]:
+    buffers = getattr(_scratch, "buffers", None)
+    if buffers is None or buffers[0].shape[0] != size:
+        buffers = (np.empty((size, size), np.uint8), np.empty((size, size), np.uint8))
+        _scratch.buffers = buffers
+    return buffers
+
+def _warp_and_gamma(frame, M, maps, size: int):
+    """
+    Warp frame onto the size x size correction square and gamma-adjust it; returns
+    (warped, gamma). On the GPU when OpenCV has CUDA, with a single upload; on
+    the CPU through the cached remap tables when there are some.
+    """
+    global _gpu_gamma
+    size = (size, size)
+    if _CUDA:
+        if _gpu_gamma is None:
+            _gpu_gamma = cv.cuda.createLookUpTable(sb.gamma_lut(CORRECTION_GAMMA).reshape(1, 256))
+        gpu_frame = cv.cuda_GpuMat()
+        gpu_frame.upload(frame)
+        gpu_warped = cv.cuda.warpPerspective(gpu_frame, M, size, flags=cv.INTER_LINEAR)
+        return gpu_warped.download(), _gpu_gamma.transform(gpu_warped).download()
+    warped, gamma = _correction_buffers(size[0])
+    if maps is not None:
+        cv.remap(frame, maps[0], maps[1], cv.INTER_LINEAR, dst=warped)
+    else:
+        cv.warpPerspective(frame, M, size, dst=warped, flags=cv.INTER_LINEAR)
+    sb.adjust_gamma(warped, CORRECTION_GAMMA, dst=gamma)
+    return warped, gamma
+
 camera_engine_thread = None
 
 def init_camera_thread():
     global camera_engine_thread
     camera_engine_thread = cameraImageWorker()
-    camera_engine_thread.run()
+    camera_engine_thread.start()
     print("starty")
 
 
@@ -56,97 +371,81 @@ def kill_camera_thread():
 def grab_camera_thread_capture():
     global camera_engine_thread
     if camera_engine_thread:
-        ret, frame = camera_engine_thread.cap.read()
-        if ret:
-            _, buffer = cv.imencode('.jpg', frame)
-            return Response(content=buffer.tobytes(), media_type="image/png")
+        frame = camera_engine_thread.snapshot()
+        if frame is not None:
+            return _encode(frame)
     return None
 
 def aruco_marker_capture():
     global camera_engine_thread
     if camera_engine_thread:
-        aruco_dict = cv.aruco.getPredefinedDictionary(cv.aruco.DICT_6X6_250)
-        parameters = cv.aruco.DetectorParameters()
-        ret, frame = camera_engine_thread.cap.read()
-        detector = cv.aruco.ArucoDetector(aruco_dict, parameters)
-        if ret:
-            marker_corners, marker_ids, _ = detector.detectMarkers(frame)
-            outImage: cv.Mat = frame.copy()
-            cv.aruco.drawDetectedMarkers(outImage, marker_corners, marker_ids)
-            _, buffer = cv.imencode('.png', outImage)
-            return Response(content=buffer.tobytes(), media_type="image/png")
+        detection = camera_engine_thread.detection_snapshot()
+        if detection is not None:
+            # The detection thread annotates and encodes alongside each result
+            jpeg = camera_engine_thread.aruco_jpeg
+            if jpeg is not None:
+                return Response(content=jpeg, media_type="image/jpeg")
+            frame, _, marker_corners, marker_ids = detection
+            return _encode(_annotate(frame, marker_corners, marker_ids))
     return None
 
-def position_correction_capture(thres: int):
-    global camera_engine_thread
+def cached_camera_capture():
+    """/current-frame from the capture thread's encoded preview; None on a cold start"""
     if camera_engine_thread:
-        aruco_dict = cv.aruco.getPredefinedDictionary(cv.aruco.DICT_6X6_250)
-        parameters = cv.aruco.DetectorParameters()
-        detector = cv.aruco.ArucoDetector(aruco_dict, parameters)
+        jpeg = camera_engine_thread.preview_jpeg()
+        if jpeg is not None:
+            return Response(content=jpeg, media_type="image/jpeg")
+    return None
 
-        ret, frame = camera_engine_thread.cap.read()
-        if ret:
-            marker_corners, marker_ids, _ = detector.detectMarkers(frame)
+def cached_aruco_capture():
+    """/current-frame-aruco from the detection thread's encoded output; None on a cold start"""
+    if camera_engine_thread:
+        jpeg = camera_engine_thread.aruco_preview_jpeg()
+        if jpeg is not None:
+            return Response(content=jpeg, media_type="image/jpeg")
+    return None
+
+def position_correction_capture(thres: int, scale_factor: int = 1):
+    global camera_engine_thread
+    if camera_engine_thread:
+        detection = camera_engine_thread.detection_snapshot()
+        if detection is not None:
+            _, gray, marker_corners, marker_ids = detection
 
             if marker_ids is not None:
-                marker_ids_flat = marker_ids.flatten()
-                required_ids = {1, 2, 3, 4}
-                found_ids = set(marker_ids_flat)
-
-                if required_ids.issubset(found_ids):
-                    corners_dict = {id[0]: corner for id, corner in zip(marker_ids, marker_corners)}
-
-                    try:
-                        # Pick specific corners from each marker (adjust as needed)
-                        pts1 = np.array([
-                            corners_dict[1][0][0],  # top-left corner of marker 1
-                            corners_dict[2][0][1],  # top-right corner of marker 2
-                            corners_dict[4][0][2],  # bottom-right corner of marker 4
-                            corners_dict[3][0][3],  # bottom-left corner of marker 3
-                        ], dtype="float32")
-
-                        scale_factor = 2  # or 3, 4, etc.
-
-                        output_width = int(1280 * scale_factor)
-                        output_height = int(1280 * scale_factor)
-
-                        # Scale destination points accordingly
-                        pts2 = np.array([
-                            [0, 0], 
-                            [output_width - 1, 0],
-                            [output_width - 1, output_height - 1],
-                            [0, output_height - 1]
-                        ], dtype="float32")
-
-                        # Perspective transform
-                        M = cv.getPerspectiveTransform(pts1, pts2)
-                        warped = cv.warpPerspective(frame, M, (output_width, output_height), flags=cv.INTER_LINEAR)
-                        # equalized = cv.equalizeHist(grayscale)
-                        # 
-                        brightness_contrast, a, b = automatic_brightness_and_contrast(warped)  
-                        grayscale = cv.cvtColor(warped, cv.COLOR_BGR2GRAY)
-                        # threshold = cv.threshold(grayscale, thres, 255, cv.THRESH_BINARY)[1]
-                        #ret, otsu_thresh = cv.threshold(grayscale, 0, 255, cv.THRESH_BINARY + cv.THRESH_OTSU)
-                        #adaptive_mean_thresh = cv.adaptiveThreshold(img, 255,
-                        #                        cv.ADAPTIVE_THRESH_MEAN_C,
-                        #                        cv.THRESH_BINARY, 11, 2)
-                        #   Apply adaptive Gaussian thresholding
-                        # Apply adaptive thresholding using ADAPTIVE_THRESH_MEAN_C
-                        #thresh_mean = cv.adaptiveThreshold(grayscale, 255, cv.ADAPTIVE_THRESH_MEAN_C,cv.THRESH_BINARY, 11, 2)
-                        #thresh_gaussian = cv.adaptiveThreshold(grayscale, 255, cv.ADAPTIVE_THRESH_GAUSSIAN_C,
-                         #               cv.THRESH_BINARY, 11, 2)
-                        
-                        #final = sb.combine_process(brightness_contrast, thresh_gaussian)
+                pts1 = _correction_points(marker_corners, marker_ids)
 
-                        gamma = sb.adjust_gamma(warped, 1.2)
-                        mask = sb.process_image(gamma)
-                        final = sb.combine_process(warped, mask)
+                if pts1 is not None:
+                    # Perspective transform
+                    size = CORRECTION_SIZE * scale_factor
+                    M, maps = _correction_matrix(pts1, size)
+                    # Everything downstream is single-channel, so warp the gray
+                    # frame the detector already made: a third of the BGR traffic.
+                    # Gamma is applied after the gray conversion, not per BGR
+                    # channel; gamma is non-linear, so strongly coloured pixels
+                    # land on different grey levels than before (saturated red:
+                    # ~93 now, ~76 before) and the mask can differ there. Accepted: the
+                    # page is mostly black ink on white, where both orders agree
+                    warped, gamma = _warp_and_gamma(gray, M, maps, size)
+                    # equalized = cv.equalizeHist(grayscale)
+                    # 
+                    # threshold = cv.threshold(grayscale, thres, 255, cv.THRESH_BINARY)[1]
+                    #ret, otsu_thresh = cv.threshold(grayscale, 0, 255, cv.THRESH_BINARY + cv.THRESH_OTSU)
+                    #adaptive_mean_thresh = cv.adaptiveThreshold(img, 255,
+                    #                        cv.ADAPTIVE_THRESH_MEAN_C,
+                    #                        cv.THRESH_BINARY, 11, 2)
+                    #   Apply adaptive Gaussian thresholding
+                    # Apply adaptive thresholding using ADAPTIVE_THRESH_MEAN_C
+                    #thresh_mean = cv.adaptiveThreshold(grayscale, 255, cv.ADAPTIVE_THRESH_MEAN_C,cv.THRESH_BINARY, 11, 2)
+                    #thresh_gaussian = cv.adaptiveThreshold(grayscale, 255, cv.ADAPTIVE_THRESH_GAUSSIAN_C,
+                     #               cv.THRESH_BINARY, 11, 2)
+                        
+                    #final = sb.combine_process(brightness_contrast, thresh_gaussian)
 
+                    mask = sb.process_image(gamma)
+                    final = sb.combine_process(warped, mask)
 
-                        # Return the corrected image    
-                        _, buffer = cv.imencode('.png', final)
-                        return Response(content=buffer.tobytes(), media_type="image/png")
 
-                    except KeyError as e:
-                        print(f"Missing marker ID: {e}")
+                    # Return the corrected image    
+                    return _encode(final, _CORRECTION_JPEG_PARAMS)
     return None
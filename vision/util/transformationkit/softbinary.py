@@ -4,16 +4,23 @@ import numpy as np
 BLOCK_SIZE = 40
 DELTA = 25
 
-# Somehow I found the value of `gamma=1.2` to be the best in my case
-def adjust_gamma(image, gamma=1.2):
+# Lookup tables per gamma, built on first use
+_GAMMA_LUTS = {}
+
+def gamma_lut(gamma):
     # build a lookup table mapping the pixel values [0, 255] to
     # their adjusted gamma values
-    invGamma = 1.0 / gamma
-    table = np.array([((i / 255.0) ** invGamma) * 255
-        for i in np.arange(0, 256)]).astype("uint8")
+    table = _GAMMA_LUTS.get(gamma)
+    if table is None:
+        invGamma = 1.0 / gamma
+        table = np.clip(((np.arange(256) / 255.0) ** invGamma) * 255, 0, 255).astype(np.uint8)
+        _GAMMA_LUTS[gamma] = table
+    return table
 
+# Somehow I found the value of `gamma=1.2` to be the best in my case
+def adjust_gamma(image, gamma=1.2, dst=None):
     # apply gamma correction using the lookup table
-    return cv2.LUT(image, table)
+    return cv2.LUT(image, gamma_lut(gamma), dst=dst)
 
 def preprocess(image):
     image = cv2.medianBlur(image, 3)
@@ -27,11 +34,12 @@ def postprocess(image):
     image = cv2.morphologyEx(image, cv2.MORPH_OPEN, kernel)
     return image
 
-# Just a helper function that generates box coordinates
+# Just a helper function that generates box coordinates. Slices give views
+# of the block instead of gathering it through meshgrid fancy indexing
 def get_block_index(image_shape, yx, block_size): 
-    y = np.arange(max(0, yx[0]-block_size), min(image_shape[0], yx[0]+block_size))
-    x = np.arange(max(0, yx[1]-block_size), min(image_shape[1], yx[1]+block_size))
-    return np.meshgrid(y, x)
+    y = slice(max(0, yx[0]-block_size), min(image_shape[0], yx[0]+block_size))
+    x = slice(max(0, yx[1]-block_size), min(image_shape[1], yx[1]+block_size))
+    return y, x
 
 
 def adaptive_median_threshold(img_in):
@@ -56,7 +64,7 @@ def block_image_process(image, block_size):
 
 # This function invokes the whole pipeline of Step 2.
 def process_image(img):
-    image_in = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    image_in = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     image_in = preprocess(image_in)
     image_out = block_image_process(image_in, BLOCK_SIZE)
     image_out = postprocess(image_out)
@@ -133,7 +141,7 @@ def combine_postprocess(image):
 
 # The main function of this section. Executes the whole pipeline.
 def combine_process(img, mask):
-    image_in = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    image_in = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     image_out = combine_block_image_process(image_in, mask, 20)
     image_out = combine_postprocess(image_out)
     return image_out
\ No newline at end of file